@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections.abc import Collection, Mapping
+from datetime import UTC, datetime
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.db import Row
+from app.repositories import UserRepository
+from app.utils import now_utc
+
+try:
+    import numpy as np
+except ImportError:  # only DISCOVERY_ENGINE=memory needs it
+    np = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+ENGINE_CHANGES_CHANNEL = "discover_engine:changed"
+_LOAD_BATCH = 5000
+_INITIAL_CAPACITY = 1024
+_RESUBSCRIBE_DELAY_SECONDS = 1.0
+_EARTH_RADIUS_KM = 6371.0
+
+_GENDER_CODES = {"male": 0, "female": 1}
+_SEEKING_CODES = {"male": 0, "female": 1, "both": 2}
+_UNKNOWN = -1
+# Larger than any created_at span, so unlocated viewers see their own region first.
+_REGION_MISS_SECONDS = 1e10
+
+
+def _timestamp(value: datetime | None) -> float:
+    return value.replace(tzinfo=UTC).timestamp() if value is not None else 0.0
+
+
+def _discoverable(row: Mapping[str, Any] | None) -> bool:
+    # Same eligibility as the candidate queries in UserRepository.
+    return (
+        row is not None
+        and not row["is_banned"]
+        and row["gender"] in _GENDER_CODES
+        and row["photo_id"] is not None
+        and row["age"] is not None
+        and row["location_region"] is not None
+        and row["township"] is not None
+    )
+
+
+def _distances(latitudes: Any, longitudes: Any, latitude: float, longitude: float) -> Any:
+    # Haversine over radians; agrees with the SQL spherical law of cosines far below any
+    # ranking difference.
+    lat1 = np.radians(latitude)
+    dlat = latitudes - lat1
+    dlon = longitudes - np.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(latitudes) * np.sin(dlon / 2) ** 2
+    distances = 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    # Unlocated candidates go after every located one, as NULLS LAST does in the SQL.
+    return np.where(np.isnan(distances), np.inf, distances)
+
+
+class MemoryCandidateEngine:
+    # Columnar snapshot of every discoverable user in NumPy arrays, ranked with the same filters
+    # and ORDER BY as UserRepository.list_candidate_ids except the actions anti-join, which the
+    # caller replaces with an exclusion set and an exact check. Rows are never removed, only
+    # hidden; a restart compacts them. Writes made through UserRepository reach this process
+    # through a listener and the other replicas through pub/sub; when one of those is missed the
+    # engine stops serving and rescans Postgres.
+    def __init__(self, users: UserRepository, redis_client: Redis) -> None:
+        if np is None:
+            raise RuntimeError("DISCOVERY_ENGINE=memory requires numpy (pip install numpy).")
+        self.users = users
+        self.redis = redis_client
+        self.ready = False
+        self._origin = uuid.uuid4().hex[:12]
+        self._listener: asyncio.Task[None] | None = None
+        self._reload: asyncio.Task[None] | None = None
+        self._positions: dict[int, int] = {}
+        self._regions: dict[str, int] = {}
+        self._size = 0
+        self._user_ids = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        self._gender = np.full(_INITIAL_CAPACITY, _UNKNOWN, dtype=np.int8)
+        self._seeking = np.full(_INITIAL_CAPACITY, _UNKNOWN, dtype=np.int8)
+        self._region = np.full(_INITIAL_CAPACITY, _UNKNOWN, dtype=np.int32)
+        self._latitude = np.full(_INITIAL_CAPACITY, np.nan)
+        self._longitude = np.full(_INITIAL_CAPACITY, np.nan)
+        self._created_at = np.zeros(_INITIAL_CAPACITY)
+        self._updated_at = np.zeros(_INITIAL_CAPACITY)
+        # Banned, deleted and incomplete profiles alike.
+        self._hidden = np.ones(_INITIAL_CAPACITY, dtype=np.bool_)
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._user_ids)
+
+        def grown(column: Any, fill: Any) -> Any:
+            resized = np.full(capacity, fill, dtype=column.dtype)
+            resized[: len(column)] = column
+            return resized
+
+        self._user_ids = grown(self._user_ids, 0)
+        self._gender = grown(self._gender, _UNKNOWN)
+        self._seeking = grown(self._seeking, _UNKNOWN)
+        self._region = grown(self._region, _UNKNOWN)
+        self._latitude = grown(self._latitude, np.nan)
+        self._longitude = grown(self._longitude, np.nan)
+        self._created_at = grown(self._created_at, 0.0)
+        self._updated_at = grown(self._updated_at, 0.0)
+        self._hidden = grown(self._hidden, True)
+
+    @property
+    def rows(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        columns = (
+            self._user_ids,
+            self._gender,
+            self._seeking,
+            self._region,
+            self._latitude,
+            self._longitude,
+            self._created_at,
+            self._updated_at,
+            self._hidden,
+        )
+        return sum(column.nbytes for column in columns)
+
+    async def start(self) -> None:
+        # The listener starts first so no change published during the load is missed; updated_at
+        # keeps a page read before a change from overwriting it.
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(), name="candidate-engine-changes")
+        await self.load()
+
+    async def close(self) -> None:
+        tasks = [task for task in (self._listener, self._reload) if task is not None]
+        self._listener = self._reload = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def on_user_changed(self, user_id: int, row: Row | None) -> None:
+        self._apply(user_id, row)
+        try:
+            await self.redis.publish(ENGINE_CHANGES_CHANNEL, f"{self._origin}:{user_id}")
+        except RedisError:
+            logger.warning("Candidate engine change broadcast failed for %s", user_id, exc_info=True)
+
+    def rank(
+        self,
+        viewer_id: int,
+        viewer_gender: str,
+        seeking: str,
+        viewer_latitude: float | None,
+        viewer_longitude: float | None,
+        viewer_region: str | None,
+        limit: int = 80,
+        exclude: Collection[int] = (),
+    ) -> list[int]:
+        # Runs in a worker thread while the event loop keeps applying changes: _grow() replaces
+        # the columns rather than resizing them, so the references taken here stay valid, and a
+        # row changed mid-rank is at worst ranked by its previous values.
+        size = self._size
+        user_ids = self._user_ids[:size]
+        hidden = self._hidden[:size]
+        gender = self._gender[:size]
+        candidate_seeking = self._seeking[:size]
+        region = self._region[:size]
+        created_at = self._created_at[:size]
+        latitude = self._latitude[:size]
+        longitude = self._longitude[:size]
+        mask = ~hidden
+        mask &= user_ids != viewer_id
+        if seeking == "both":
+            mask &= gender != _UNKNOWN
+        else:
+            mask &= gender == _GENDER_CODES.get(seeking, _UNKNOWN - 1)
+        mask &= (candidate_seeking == _SEEKING_CODES["both"]) | (
+            candidate_seeking == _SEEKING_CODES.get(viewer_gender, _UNKNOWN - 1)
+        )
+        if exclude:
+            mask &= ~np.isin(user_ids, np.fromiter(exclude, dtype=np.int64, count=len(exclude)))
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return []
+
+        if viewer_region is None:
+            region_match = np.ones(rows.size, dtype=np.bool_)
+        else:
+            region_match = region[rows] == self._regions.get(viewer_region, _UNKNOWN - 1)
+        created_at = created_at[rows]
+        if viewer_latitude is not None and viewer_longitude is not None:
+            primary = _distances(latitude[rows], longitude[rows], float(viewer_latitude), float(viewer_longitude))
+        else:
+            primary = np.where(region_match, 0.0, _REGION_MISS_SECONDS) - created_at
+
+        # argpartition finds the limit-th best primary key; every row tied with it is kept so
+        # the exact ORDER BY (distance, region match, newest) can settle the boundary.
+        if rows.size > limit:
+            kth = primary[np.argpartition(primary, limit - 1)[limit - 1]]
+            keep = primary <= kth
+            rows, primary, region_match, created_at = rows[keep], primary[keep], region_match[keep], created_at[keep]
+        order = np.lexsort((-created_at, ~region_match, primary))[:limit]
+        return [int(user_id) for user_id in user_ids[rows[order]]]
+
+    def _apply(self, user_id: int, row: Mapping[str, Any] | None) -> None:
+        updated_at = _timestamp(row["updated_at"]) if row is not None else _timestamp(now_utc())
+        position = self._positions.get(user_id)
+        if position is not None and self._updated_at[position] > updated_at:
+            return
+        if position is None:
+            # Hidden users get a slot too, so their updated_at outranks an older snapshot page.
+            if self._size == len(self._user_ids):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._positions[user_id] = position
+            self._user_ids[position] = user_id
+        self._updated_at[position] = updated_at
+        if row is None or not _discoverable(row):
+            self._hidden[position] = True
+            return
+        region = str(row["location_region"])
+        latitude, longitude = row["latitude"], row["longitude"]
+        self._gender[position] = _GENDER_CODES[row["gender"]]
+        self._seeking[position] = _SEEKING_CODES.get(row["seeking"], _UNKNOWN)
+        self._region[position] = self._regions.setdefault(region, len(self._regions))
+        self._latitude[position] = np.radians(latitude) if latitude is not None else np.nan
+        self._longitude[position] = np.radians(longitude) if longitude is not None else np.nan
+        self._created_at[position] = _timestamp(row["created_at"])
+        self._hidden[position] = False
+
+    async def load(self) -> None:
+        # Also used to resync: rows the scan no longer returns are hidden unless a change
+        # applied since the scan started says otherwise.
+        started_at = _timestamp(now_utc())
+        loaded: list[int] = []
+        after_user_id = 0
+        while True:
+            rows = await self.users.list_discoverable(after_user_id, _LOAD_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                user_id = int(row["user_id"])
+                self._apply(user_id, row)
+                loaded.append(self._positions[user_id])
+            after_user_id = int(rows[-1]["user_id"])
+            # Let updates run between pages.
+            await asyncio.sleep(0)
+        gone = np.ones(self._size, dtype=np.bool_)
+        gone[np.asarray(loaded, dtype=np.int64)] = False
+        gone &= self._updated_at[: self._size] <= started_at
+        self._hidden[: self._size] |= gone
+        self.ready = True
+        logger.info("Candidate engine loaded %s users", self._size)
+
+    def _resync(self) -> None:
+        # Some change was missed: rank with Postgres until a fresh scan has caught up.
+        self.ready = False
+        if self._reload is None or self._reload.done():
+            self._reload = asyncio.create_task(self._reload_until_loaded(), name="candidate-engine-reload")
+
+    async def _reload_until_loaded(self) -> None:
+        while True:
+            try:
+                await self.load()
+                return
+            except Exception:
+                logger.exception("Candidate engine reload failed; retrying")
+                await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
+
+    async def _listen(self) -> None:
+        resubscribing = False
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(ENGINE_CHANGES_CHANNEL)
+                    if resubscribing:
+                        # Changes published while we were not subscribed are gone; rescan.
+                        self._resync()
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        origin, _, raw_user_id = str(message["data"]).partition(":")
+                        if origin == self._origin or not raw_user_id.isdigit():
+                            continue
+                        await self._apply_remote(int(raw_user_id))
+            except RedisError:
+                logger.warning("Candidate engine subscription lost; resubscribing", exc_info=True)
+                self.ready = False
+                resubscribing = True
+                await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
+
+    async def _apply_remote(self, user_id: int) -> None:
+        try:
+            # The publishing replica has already written the row, but this process's profile
+            # cache may still hold the previous version.
+            row = await self.users.get_uncached(user_id)
+        except Exception:
+            logger.exception("Candidate engine could not reload user %s; rescanning", user_id)
+            self._resync()
+            return
+        self._apply(user_id, row)
@@ -42,6 +42,7 @@ def _parse_int(raw: str, default: int) -> int:
 class Settings:
     bot_token: str
     database_url: str
+    database_backend: str
     redis_url: str
     webhook_url: str
     webhook_path: str
@@ -53,12 +54,38 @@ class Settings:
     kbzpay_qr_file_id: str
     wavemoney_qr_file_id: str
     default_language: str
+    discovery_refill_watermark: int
+    discovery_refill_workers: int
+    discovery_prefetch_cards: int
+    discovery_seen_filter_min_actions: int
+    discovery_segment_pools: bool
+    discovery_engine: str
+    outbound_rate_per_second: int
+    webhook_workers: int
+    webhook_queue_size: int
+    update_bus_enabled: bool
+    update_bus_partitions: int
+    metrics_port: int
+    ready_max_pool_wait_ms: int
+    ready_max_db_ms: int
+    ready_max_redis_ms: int
+    ready_cache_seconds: int
+    telegram_api_url: str
+    slow_update_ms: int
+    profile_every: int
+    profile_dir: str
+    profile_cache_ttl_seconds: int
+    profile_cache_local_ttl_seconds: int
+    profile_cache_local_size: int
 
     @classmethod
     def from_env(cls) -> "Settings":
         load_dotenv()
         bot_token = os.getenv("BOT_TOKEN", "").strip()
         database_url = os.getenv("DATABASE_URL", "").strip()
+        database_backend = os.getenv("DATABASE_BACKEND", "sqlalchemy").strip().lower()
+        if database_backend not in {"sqlalchemy", "asyncpg"}:
+            database_backend = "sqlalchemy"
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0").strip()
         webhook_url = os.getenv("WEBHOOK_URL", "").strip()
         webhook_path = os.getenv("WEBHOOK_PATH", "/webhook").strip() or "/webhook"
@@ -74,6 +101,31 @@ class Settings:
         default_language = os.getenv("DEFAULT_LANGUAGE", "en").strip().lower()
         if default_language not in {"en", "my"}:
             default_language = "en"
+        discovery_refill_watermark = max(0, _parse_int(os.getenv("DISCOVERY_REFILL_WATERMARK", "10"), 10))
+        discovery_refill_workers = max(0, _parse_int(os.getenv("DISCOVERY_REFILL_WORKERS", "4"), 4))
+        discovery_prefetch_cards = max(0, _parse_int(os.getenv("DISCOVERY_PREFETCH_CARDS", "10"), 10))
+        discovery_seen_filter_min_actions = max(0, _parse_int(os.getenv("DISCOVERY_SEEN_FILTER_MIN_ACTIONS", "2000"), 2000))
+        discovery_segment_pools = _parse_bool(os.getenv("DISCOVERY_SEGMENT_POOLS", "false"), False)
+        discovery_engine = os.getenv("DISCOVERY_ENGINE", "sql").strip().lower()
+        if discovery_engine not in {"sql", "memory"}:
+            discovery_engine = "sql"
+        outbound_rate_per_second = max(1, _parse_int(os.getenv("OUTBOUND_RATE_PER_SECOND", "25"), 25))
+        webhook_workers = max(0, _parse_int(os.getenv("WEBHOOK_WORKERS", "0"), 0))
+        webhook_queue_size = max(1, _parse_int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"), 1000))
+        update_bus_enabled = _parse_bool(os.getenv("UPDATE_BUS_ENABLED", "false"), False)
+        update_bus_partitions = max(1, _parse_int(os.getenv("UPDATE_BUS_PARTITIONS", "8"), 8))
+        metrics_port = max(0, _parse_int(os.getenv("METRICS_PORT", "0"), 0))
+        ready_max_pool_wait_ms = max(1, _parse_int(os.getenv("READY_MAX_POOL_WAIT_MS", "250"), 250))
+        ready_max_db_ms = max(1, _parse_int(os.getenv("READY_MAX_DB_MS", "500"), 500))
+        ready_max_redis_ms = max(1, _parse_int(os.getenv("READY_MAX_REDIS_MS", "200"), 200))
+        ready_cache_seconds = max(0, _parse_int(os.getenv("READY_CACHE_SECONDS", "2"), 2))
+        telegram_api_url = os.getenv("TELEGRAM_API_URL", "").strip().rstrip("/")
+        slow_update_ms = max(0, _parse_int(os.getenv("SLOW_UPDATE_MS", "1000"), 1000))
+        profile_every = max(0, _parse_int(os.getenv("PROFILE_EVERY", "0"), 0))
+        profile_dir = os.getenv("PROFILE_DIR", "profiles").strip() or "profiles"
+        profile_cache_ttl_seconds = max(0, _parse_int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600"), 3600))
+        profile_cache_local_ttl_seconds = max(0, _parse_int(os.getenv("PROFILE_CACHE_LOCAL_TTL_SECONDS", "5"), 5))
+        profile_cache_local_size = max(0, _parse_int(os.getenv("PROFILE_CACHE_LOCAL_SIZE", "10000"), 10000))
 
         if not bot_token:
             raise ValueError("BOT_TOKEN is required.")
@@ -83,6 +135,7 @@ class Settings:
         return cls(
             bot_token=bot_token,
             database_url=database_url,
+            database_backend=database_backend,
             redis_url=redis_url,
             webhook_url=webhook_url,
             webhook_path=webhook_path,
@@ -94,4 +147,27 @@ class Settings:
             kbzpay_qr_file_id=kbzpay_qr_file_id,
             wavemoney_qr_file_id=wavemoney_qr_file_id,
             default_language=default_language,
+            discovery_refill_watermark=discovery_refill_watermark,
+            discovery_refill_workers=discovery_refill_workers,
+            discovery_prefetch_cards=discovery_prefetch_cards,
+            discovery_seen_filter_min_actions=discovery_seen_filter_min_actions,
+            discovery_segment_pools=discovery_segment_pools,
+            discovery_engine=discovery_engine,
+            outbound_rate_per_second=outbound_rate_per_second,
+            webhook_workers=webhook_workers,
+            webhook_queue_size=webhook_queue_size,
+            update_bus_enabled=update_bus_enabled,
+            update_bus_partitions=update_bus_partitions,
+            metrics_port=metrics_port,
+            ready_max_pool_wait_ms=ready_max_pool_wait_ms,
+            ready_max_db_ms=ready_max_db_ms,
+            ready_max_redis_ms=ready_max_redis_ms,
+            ready_cache_seconds=ready_cache_seconds,
+            telegram_api_url=telegram_api_url,
+            slow_update_ms=slow_update_ms,
+            profile_every=profile_every,
+            profile_dir=profile_dir,
+            profile_cache_ttl_seconds=profile_cache_ttl_seconds,
+            profile_cache_local_ttl_seconds=profile_cache_local_ttl_seconds,
+            profile_cache_local_size=profile_cache_local_size,
         )
@@ -7,6 +7,7 @@ from redis.asyncio import Redis
 
 from app.config import Settings
 from app.db import Database
+from app.outbound import OutboundDispatcher
 from app.repositories import ActionRepository, PremiumRequestRepository, ReportRepository, UserRepository
 from app.services import DiscoveryService
 
@@ -21,6 +22,7 @@ class AppContext:
     premium_requests: PremiumRequestRepository
     reports: ReportRepository
     discovery: DiscoveryService
+    outbound: OutboundDispatcher
 
 
 _APP_CONTEXT: AppContext | None = None
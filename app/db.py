@@ -1,22 +1,53 @@
 from __future__ import annotations
 
 import re
-from pathlib import Path
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from time import perf_counter
+from typing import TypeAlias
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+import asyncpg
 from sqlalchemy import text
 from sqlalchemy.engine import RowMapping
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
+from app.metrics import observe_db_query
+
+Row: TypeAlias = RowMapping | asyncpg.Record
+
+DATABASE_BACKENDS = {"sqlalchemy", "asyncpg"}
+_POOL_SIZE = 10
+_POOL_MAX_OVERFLOW = 10
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledQuery:
+    sql: str
+    clause: TextClause
+    param_names: tuple[str, ...]
+
 
 class Database:
-    def __init__(self, dsn: str) -> None:
+    def __init__(self, dsn: str, backend: str = "sqlalchemy", statement_cache_size: int = 256) -> None:
+        if backend not in DATABASE_BACKENDS:
+            raise ValueError(f"Unsupported database backend: {backend}")
+        self.backend = backend
         self.dsn, self.connect_args = self._normalize_dsn(dsn)
         self.engine: AsyncEngine | None = None
+        self.pool: asyncpg.Pool | None = None
         self._arg_pattern = re.compile(r"\$(\d+)")
         self._cast_bind_pattern = re.compile(
             r":p(\d+)::([a-zA-Z_][a-zA-Z0-9_]*(?:\[\])?(?:\s+[a-zA-Z_][a-zA-Z0-9_]*)*)"
         )
+        # Repositories pass constant SQL strings, so the rewritten TextClause is cached per raw query.
+        self.statement_cache_size = statement_cache_size
+        self._statement_cache: OrderedDict[str, CompiledQuery] = OrderedDict()
+        self.statement_cache_hits = 0
+        self.statement_cache_misses = 0
 
     @staticmethod
     def _normalize_dsn(dsn: str) -> tuple[str, dict[str, object]]:
@@ -61,7 +92,8 @@ class Database:
         )
         return normalized, connect_args
 
-    def _compile_query(self, query: str, args: tuple[object, ...]) -> tuple[str, dict[str, object]]:
+    def _build_query(self, query: str) -> CompiledQuery:
+        indexes = [int(match.group(1)) for match in self._arg_pattern.finditer(query)]
         sql = self._arg_pattern.sub(lambda match: f":p{match.group(1)}", query)
         # SQLAlchemy text() cannot always parse bind params followed by ::type.
         # Rewrite to CAST(:pN AS type) so asyncpg gets valid compiled SQL.
@@ -69,56 +101,176 @@ class Database:
             lambda match: f"CAST(:p{match.group(1)} AS {match.group(2)})",
             sql,
         )
-        params = {f"p{index}": value for index, value in enumerate(args, start=1)}
-        return sql, params
+        param_names = tuple(f"p{index}" for index in range(1, max(indexes, default=0) + 1))
+        return CompiledQuery(sql=sql, clause=text(sql), param_names=param_names)
+
+    def _compile_query(self, query: str, args: tuple[object, ...]) -> tuple[TextClause, dict[str, object]]:
+        compiled = self._statement_cache.get(query)
+        if compiled is None:
+            self.statement_cache_misses += 1
+            compiled = self._build_query(query)
+            self._statement_cache[query] = compiled
+            if len(self._statement_cache) > self.statement_cache_size:
+                self._statement_cache.popitem(last=False)
+        else:
+            self.statement_cache_hits += 1
+            self._statement_cache.move_to_end(query)
+        return compiled.clause, dict(zip(compiled.param_names, args))
+
+    def statement_cache_info(self) -> dict[str, int]:
+        return {
+            "hits": self.statement_cache_hits,
+            "misses": self.statement_cache_misses,
+            "size": len(self._statement_cache),
+            "max_size": self.statement_cache_size,
+        }
+
+    @property
+    def _asyncpg_dsn(self) -> str:
+        return self.dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
 
     async def connect(self) -> None:
+        if self.backend == "asyncpg":
+            # Native path: $n placeholders go to asyncpg untouched and each connection keeps
+            # its own prepared-statement cache for the repositories' constant queries.
+            self.pool = await asyncpg.create_pool(
+                self._asyncpg_dsn,
+                min_size=2,
+                max_size=_POOL_SIZE + _POOL_MAX_OVERFLOW,
+                **self.connect_args,
+            )
+            return
         self.engine = create_async_engine(
             self.dsn,
             pool_pre_ping=True,
-            pool_size=10,
-            max_overflow=10,
+            pool_size=_POOL_SIZE,
+            max_overflow=_POOL_MAX_OVERFLOW,
             connect_args=self.connect_args,
         )
 
     async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
         if self.engine is not None:
             await self.engine.dispose()
             self.engine = None
 
     async def execute(self, query: str, *args: object) -> str:
+        started = perf_counter()
+        failed = True
+        try:
+            status = await self._execute(query, args)
+            failed = False
+            return status
+        finally:
+            observe_db_query(query, perf_counter() - started, failed)
+
+    async def fetch(self, query: str, *args: object) -> list[Row]:
+        started = perf_counter()
+        failed = True
+        try:
+            rows = await self._fetch(query, args)
+            failed = False
+            return rows
+        finally:
+            observe_db_query(query, perf_counter() - started, failed)
+
+    async def fetchrow(self, query: str, *args: object) -> Row | None:
+        started = perf_counter()
+        failed = True
+        try:
+            row = await self._fetchrow(query, args)
+            failed = False
+            return row
+        finally:
+            observe_db_query(query, perf_counter() - started, failed)
+
+    async def _execute(self, query: str, args: tuple[object, ...]) -> str:
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                status = await conn.execute(query, *args)
+            affected = status.rsplit(" ", 1)[-1]
+            return f"OK {affected if affected.isdigit() else 0}"
         if self.engine is None:
             raise RuntimeError("Database engine is not initialized.")
-        sql, params = self._compile_query(query, args)
+        clause, params = self._compile_query(query, args)
         async with self.engine.begin() as conn:
-            result = await conn.execute(text(sql), params)
+            result = await conn.execute(clause, params)
         affected = result.rowcount if result.rowcount is not None else 0
         return f"OK {affected}"
 
-    async def fetch(self, query: str, *args: object) -> list[RowMapping]:
+    async def _fetch(self, query: str, args: tuple[object, ...]) -> list[Row]:
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                return await conn.fetch(query, *args)
         if self.engine is None:
             raise RuntimeError("Database engine is not initialized.")
-        sql, params = self._compile_query(query, args)
+        clause, params = self._compile_query(query, args)
         async with self.engine.begin() as conn:
-            result = await conn.execute(text(sql), params)
+            result = await conn.execute(clause, params)
             rows = result.mappings().all()
         return list(rows)
 
-    async def fetchrow(self, query: str, *args: object) -> RowMapping | None:
+    async def _fetchrow(self, query: str, args: tuple[object, ...]) -> Row | None:
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                return await conn.fetchrow(query, *args)
         if self.engine is None:
             raise RuntimeError("Database engine is not initialized.")
-        sql, params = self._compile_query(query, args)
+        clause, params = self._compile_query(query, args)
         async with self.engine.begin() as conn:
-            result = await conn.execute(text(sql), params)
+            result = await conn.execute(clause, params)
             row = result.mappings().first()
         return row
 
-    async def init_schema(self) -> None:
+    @asynccontextmanager
+    async def raw_connection(self) -> AsyncIterator[asyncpg.Connection]:
+        # A dedicated driver connection for session-scoped work (advisory locks, scripts,
+        # statements that must run outside a transaction) on either backend.
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                yield conn
+            return
         if self.engine is None:
             raise RuntimeError("Database engine is not initialized.")
-        schema_path = Path(__file__).resolve().parent.parent / "db" / "init.sql"
-        sql = schema_path.read_text(encoding="utf-8")
-        statements = [item.strip() for item in sql.split(";") if item.strip()]
-        async with self.engine.begin() as conn:
-            for statement in statements:
-                await conn.execute(text(statement))
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            yield raw.driver_connection
+
+    async def ping(self) -> tuple[float, float]:
+        # Returns (seconds waiting for a pooled connection, seconds running SELECT 1).
+        started = perf_counter()
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                acquired = perf_counter()
+                await conn.fetchval("SELECT 1")
+                return acquired - started, perf_counter() - acquired
+        if self.engine is None:
+            raise RuntimeError("Database engine is not initialized.")
+        async with self.engine.connect() as conn:
+            acquired = perf_counter()
+            await conn.execute(text("SELECT 1"))
+            return acquired - started, perf_counter() - acquired
+
+    def pool_stats(self) -> dict[str, int]:
+        if self.pool is not None:
+            size = self.pool.get_size()
+            idle = self.pool.get_idle_size()
+            return {
+                "size": size,
+                "checked_out": size - idle,
+                "idle": idle,
+                "overflow": 0,
+                "max_size": self.pool.get_max_size(),
+            }
+        if self.engine is not None:
+            pool = self.engine.pool
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_size": _POOL_SIZE + _POOL_MAX_OVERFLOW,
+            }
+        return {"size": 0, "checked_out": 0, "idle": 0, "overflow": 0, "max_size": 0}
@@ -18,7 +18,7 @@ def _is_admin(admin_ids: set[int], user_id: int) -> bool:
     return user_id in admin_ids
 
 
-async def _apply_premium_days(user_id: int, days: int, actor_bot, app) -> None:
+async def _apply_premium_days(user_id: int, days: int, app) -> None:
     user = await app.users.get(user_id)
     base = now_utc()
     if user is not None and user["premium_until"] is not None and user["premium_until"] > base:
@@ -27,10 +27,7 @@ async def _apply_premium_days(user_id: int, days: int, actor_bot, app) -> None:
     await app.users.set_premium_until(user_id, premium_until)
 
     user_lang = (user["language"] if user else app.settings.default_language) or app.settings.default_language
-    try:
-        await actor_bot.send_message(user_id, t(user_lang, "premium_welcome"))
-    except TelegramAPIError:
-        pass
+    await app.outbound.send_message(user_id, t(user_lang, "premium_welcome"))
 
 
 @router.message(Command("ban"))
@@ -56,10 +53,7 @@ async def cmd_ban(message: Message) -> None:
     await app.discovery.purge_candidate_everywhere(target_id)
     await app.redis.delete(f"rewind_last_dislike:{target_id}")
     await message.answer(t(lang, "user_banned"))
-    try:
-        await message.bot.send_message(target_id, t("en", "banned"))
-    except TelegramAPIError:
-        pass
+    await app.outbound.send_message(target_id, t("en", "banned"))
 
 
 @router.message(Command("unban"))
@@ -81,6 +75,7 @@ async def cmd_unban(message: Message) -> None:
 
     target_id = int(parts[1])
     await app.users.set_banned(target_id, False)
+    await app.discovery.restore_candidate(target_id)
     await message.answer(t(lang, "user_unbanned"))
 
 
@@ -154,7 +149,7 @@ async def cmd_approve(message: Message) -> None:
         await message.answer(t(lang, "premium_no_pending"))
         return
 
-    await _apply_premium_days(user_id=user_id, days=days, actor_bot=message.bot, app=app)
+    await _apply_premium_days(user_id=user_id, days=days, app=app)
     await message.answer(t(lang, "admin_premium_done", days=days))
 
 
@@ -190,10 +185,7 @@ async def cmd_reject(message: Message) -> None:
 
     user = await app.users.get(user_id)
     user_lang = (user["language"] if user else app.settings.default_language) or app.settings.default_language
-    try:
-        await message.bot.send_message(user_id, t(user_lang, "premium_rejected"))
-    except TelegramAPIError:
-        pass
+    await app.outbound.send_message(user_id, t(user_lang, "premium_rejected"))
     await message.answer(t(lang, "admin_reject_done"))
 
 
@@ -236,16 +228,12 @@ async def premium_decision(query: CallbackQuery) -> None:
         await _apply_premium_days(
             user_id=int(request["user_id"]),
             days=int(request["duration_days"] or 7),
-            actor_bot=query.bot,
             app=app,
         )
     else:
         user = await app.users.get(int(request["user_id"]))
         user_lang = (user["language"] if user else app.settings.default_language) or app.settings.default_language
-        try:
-            await query.bot.send_message(int(request["user_id"]), t(user_lang, "premium_rejected"))
-        except TelegramAPIError:
-            pass
+        await app.outbound.send_message(int(request["user_id"]), t(user_lang, "premium_rejected"))
 
     if query.message is not None:
         try:
@@ -292,10 +280,7 @@ async def report_admin_decision(query: CallbackQuery) -> None:
         await app.discovery.purge_candidate_everywhere(int(report["target_id"]))
         await app.redis.delete(f"rewind_last_dislike:{int(report['target_id'])}")
         await app.reports.set_status(report_id, "banned", query.from_user.id)
-        try:
-            await query.bot.send_message(int(report["target_id"]), t("en", "banned"))
-        except TelegramAPIError:
-            pass
+        await app.outbound.send_message(int(report["target_id"]), t("en", "banned"))
     else:
         await app.reports.set_status(report_id, "dismissed", query.from_user.id)
 
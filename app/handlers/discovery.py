@@ -77,15 +77,17 @@ async def _send_next_profile(message: Message, viewer_id: int) -> None:
         await message.answer(t(lang, "profile_incomplete"))
         return
 
-    candidate_id = await app.discovery.next_candidate_id(viewer)
-    if candidate_id is None:
+    next_candidate = await app.discovery.next_candidate(viewer)
+    if next_candidate is None:
         await message.answer(
             t(lang, "no_profiles"),
             reply_markup=main_menu_keyboard(lang, premium, app.settings.premium_enabled),
         )
         return
 
-    candidate = await app.users.get(candidate_id)
+    candidate_id, candidate = next_candidate
+    if candidate is None:
+        candidate = await app.users.get(candidate_id)
     if candidate is None:
         await app.discovery.clear_queue(viewer_id)
         await message.answer(
@@ -249,6 +251,7 @@ async def rewind_last_pass(query: CallbackQuery) -> None:
         return
 
     await app.actions.delete_action(query.from_user.id, target_id)
+    await app.discovery.forget_swipe(query.from_user.id, target_id)
     target = await app.users.get(target_id)
     if target is None:
         await query.message.answer(t(lang, "rewind_missing"))
@@ -283,23 +286,18 @@ async def profile_action(query: CallbackQuery) -> None:
         return
 
     actor_id = query.from_user.id
-    target_user = await app.users.get(target_id)
-    if target_user is None:
+    swipe = await app.actions.record_swipe(actor_id, target_id, action)
+    if swipe is None:
         await query.answer()
         await _send_next_profile(query.message, actor_id)
         return
 
-    previous_action = await app.actions.get_action_type(actor_id, target_id)
+    target_user = swipe.target
+    actor = swipe.actor
     positive_actions = {"like", "superlike"}
-    became_positive = action in positive_actions and previous_action not in positive_actions
-    target_already_liked_actor = False
-    if became_positive:
-        target_already_liked_actor = await app.actions.has_positive_action(target_id, actor_id)
-
-    await app.actions.save_action(actor_id, target_id, action)
-    actor = await app.users.get(actor_id)
-    if action == "dislike":
-        await app.discovery.set_last_disliked(actor_id, target_id)
+    became_positive = action in positive_actions and swipe.previous_action not in positive_actions
+    target_already_liked_actor = became_positive and swipe.target_liked_actor
+    await app.discovery.remember_swipe(actor_id, target_id, action)
 
     try:
         await query.message.edit_reply_markup(reply_markup=None)
@@ -308,49 +306,38 @@ async def profile_action(query: CallbackQuery) -> None:
 
     if action == "like" and became_positive and not target_already_liked_actor and actor is not None:
         target_lang = target_user["language"] or app.settings.default_language
-        actor_payload = dict(actor)
-        target_payload = dict(target_user)
-        actor_photo_id = actor_payload.get("photo_id")
+        actor_photo_id = actor.get("photo_id")
         if actor_photo_id:
             actor_caption = (
                 f"{t(target_lang, 'like_received')}\n\n"
-                f"{_candidate_caption(target_lang, actor_payload, distance_between_users_km(target_payload, actor_payload))}"
+                f"{_candidate_caption(target_lang, actor, distance_between_users_km(target_user, actor))}"
+            )
+            await app.outbound.send_photo(
+                target_id,
+                str(actor_photo_id),
+                lane="like",
+                caption=actor_caption,
+                reply_markup=like_back_keyboard(target_lang, actor_id),
             )
-            like_back_kb = like_back_keyboard(target_lang, actor_id)
-            try:
-                await query.bot.send_photo(
-                    chat_id=target_id,
-                    photo=actor_photo_id,  # type: ignore[arg-type]
-                    caption=actor_caption,
-                    reply_markup=like_back_kb,
-                )
-            except TelegramAPIError:
-                pass
 
     if action == "superlike":
-        actor = actor or await app.users.get(actor_id)
         if actor is not None:
             target_lang = target_user["language"] or app.settings.default_language
             actor_name = actor["full_name"] or "Someone"
-            try:
-                await query.bot.send_message(target_id, t(target_lang, "superlike_received", name=text(actor_name)))
-            except TelegramAPIError:
-                pass
+            await app.outbound.send_message(
+                target_id,
+                t(target_lang, "superlike_received", name=text(actor_name)),
+                lane="like",
+            )
 
     if became_positive and target_already_liked_actor:
-        actor = actor or await app.users.get(actor_id)
-        target = target_user
-        if actor and target:
+        if actor is not None:
             actor_lang = actor["language"] or app.settings.default_language
-            target_lang = target["language"] or app.settings.default_language
-            actor_mention = _user_mention(dict(actor))
-            target_mention = _user_mention(dict(target))
+            target_lang = target_user["language"] or app.settings.default_language
+            actor_mention = _user_mention(actor)
+            target_mention = _user_mention(target_user)
             await query.message.answer(t(actor_lang, "match", name=target_mention))
-
-            try:
-                await query.bot.send_message(target_id, t(target_lang, "match", name=actor_mention))
-            except TelegramAPIError:
-                pass
+            await app.outbound.send_message(target_id, t(target_lang, "match", name=actor_mention), lane="match")
 
     await query.answer()
     await _send_next_profile(query.message, actor_id)
@@ -380,10 +367,7 @@ async def report_prompt(query: CallbackQuery) -> None:
         f"Target ID: {target_id}"
     )
     for admin_id in app.settings.admin_ids:
-        try:
-            await query.bot.send_message(admin_id, admin_alert)
-        except TelegramAPIError:
-            continue
+        await app.outbound.send_message(admin_id, admin_alert, lane="admin")
 
     await query.message.answer(t(lang, "report_prompt"), reply_markup=report_reason_keyboard(lang, target_id))
     await query.answer()
@@ -434,14 +418,12 @@ async def report_submit(query: CallbackQuery) -> None:
         f"Reason: {text(reason_en)}"
     )
     for admin_id in app.settings.admin_ids:
-        try:
-            await query.bot.send_message(
-                admin_id,
-                admin_text,
-                reply_markup=admin_report_keyboard(report_id),
-            )
-        except TelegramAPIError:
-            continue
+        await app.outbound.send_message(
+            admin_id,
+            admin_text,
+            lane="admin",
+            reply_markup=admin_report_keyboard(report_id),
+        )
 
     await query.message.answer(t(lang, "report_submitted"))
     try:
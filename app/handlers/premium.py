@@ -212,14 +212,12 @@ async def premium_screenshot(message: Message, state: FSMContext) -> None:
         f"Reject: /reject {message.from_user.id}"
     )
     for target_id in sorted(app.settings.admin_ids):
-        try:
-            await message.bot.send_photo(
-                target_id,
-                screenshot_file_id,
-                caption=admin_caption,
-            )
-        except TelegramAPIError:
-            continue
+        await app.outbound.send_photo(
+            target_id,
+            screenshot_file_id,
+            lane="admin",
+            caption=admin_caption,
+        )
 
 
 @router.message(PremiumState.awaiting_screenshot)
@@ -260,6 +260,8 @@ async def registration_photo(message: Message, state: FSMContext) -> None:
     )
     await app.discovery.clear_queue(message.from_user.id)
     updated_user = await app.users.get(message.from_user.id)
+    if updated_user is not None and not updated_user["is_banned"]:
+        await app.discovery.restore_candidate(message.from_user.id)
     await state.clear()
     is_premium = bool(updated_user and is_premium_active(updated_user))
     await message.answer(t(language, "profile_saved"))
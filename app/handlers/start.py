@@ -173,6 +173,7 @@ async def cmd_delete_account(message: Message, state: FSMContext) -> None:
     await state.clear()
     await app.users.delete_account(message.from_user.id)
     await app.discovery.clear_queue(message.from_user.id)
+    await app.discovery.purge_candidate_everywhere(message.from_user.id)
     await app.redis.delete(f"rewind_last_dislike:{message.from_user.id}")
     await message.answer(t(lang, "delete_account_done"))
 
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+from time import monotonic, perf_counter
+from typing import Any
+
+from redis.asyncio import Redis
+
+from app.db import Database
+
+
+class ReadinessProbe:
+    def __init__(
+        self,
+        db: Database,
+        redis_client: Redis,
+        max_pool_wait_ms: int = 250,
+        max_db_ms: int = 500,
+        max_redis_ms: int = 200,
+        cache_seconds: float = 2.0,
+        timeout_seconds: float = 3.0,
+    ) -> None:
+        self.db = db
+        self.redis = redis_client
+        self.max_pool_wait_ms = max_pool_wait_ms
+        self.max_db_ms = max_db_ms
+        self.max_redis_ms = max_redis_ms
+        self.cache_seconds = cache_seconds
+        self.timeout_seconds = timeout_seconds
+        self._lock = asyncio.Lock()
+        self._cached: tuple[bool, dict[str, Any]] | None = None
+        self._cached_at = 0.0
+
+    async def check(self) -> tuple[bool, dict[str, Any]]:
+        # Orchestrators poll every replica often; concurrent requests share one probe and the
+        # result is reused for cache_seconds.
+        if self._cached is not None and monotonic() - self._cached_at < self.cache_seconds:
+            return self._cached
+        async with self._lock:
+            if self._cached is not None and monotonic() - self._cached_at < self.cache_seconds:
+                return self._cached
+            database, redis = await asyncio.gather(self._probe_database(), self._probe_redis())
+            ready = bool(database["ok"] and redis["ok"])
+            self._cached = (
+                ready,
+                {
+                    "status": "ok" if ready else "unavailable",
+                    "database": database,
+                    "redis": redis,
+                    "pool": self.db.pool_stats(),
+                },
+            )
+            self._cached_at = monotonic()
+            return self._cached
+
+    async def _probe_database(self) -> dict[str, Any]:
+        try:
+            pool_wait, query_time = await asyncio.wait_for(self.db.ping(), self.timeout_seconds)
+        except Exception as exc:
+            return {"ok": False, "error": type(exc).__name__}
+        pool_wait_ms = round(pool_wait * 1000, 2)
+        query_ms = round(query_time * 1000, 2)
+        return {
+            "ok": pool_wait_ms <= self.max_pool_wait_ms and query_ms <= self.max_db_ms,
+            "pool_wait_ms": pool_wait_ms,
+            "query_ms": query_ms,
+        }
+
+    async def _probe_redis(self) -> dict[str, Any]:
+        started = perf_counter()
+        try:
+            await asyncio.wait_for(self.redis.ping(), self.timeout_seconds)
+        except Exception as exc:
+            return {"ok": False, "error": type(exc).__name__}
+        ping_ms = round((perf_counter() - started) * 1000, 2)
+        return {"ok": ping_ms <= self.max_redis_ms, "ping_ms": ping_ms}
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+def update_shard_key(update: Update) -> int:
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.user_id is not None:
+        return context.user_id
+    if context.chat_id is not None:
+        return context.chat_id
+    return update.update_id
+
+
+# One queue per shard keyed by user id: a user's updates run in order, different users in parallel.
+class UpdateShards:
+    def __init__(self, dp: Dispatcher, bot: Bot, shards: int, queue_size: int = 1000) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.queue_size = queue_size
+        self._queues: list[asyncio.Queue[Update]] = [asyncio.Queue(maxsize=queue_size) for _ in range(max(1, shards))]
+        self._workers: list[asyncio.Task[None]] = []
+        self.accepted_total = 0
+        self.rejected_total = 0
+        self.processed_total = 0
+        self.failed_total = 0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work(queue), name=f"update-shard-{index}")
+            for index, queue in enumerate(self._queues)
+        ]
+
+    async def close(self, drain_timeout: float = 10.0) -> None:
+        workers, self._workers = self._workers, []
+        if not workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s queued updates on shutdown", sum(queue.qsize() for queue in self._queues))
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def submit(self, update: Update) -> bool:
+        queue = self._queues[update_shard_key(update) % len(self._queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected_total += 1
+            return False
+        self.accepted_total += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        depths = [queue.qsize() for queue in self._queues]
+        return {
+            "shards": len(self._queues),
+            "queue_size": self.queue_size,
+            "queued": sum(depths),
+            "max_depth": max(depths),
+            "depths": depths,
+            "accepted_total": self.accepted_total,
+            "rejected_total": self.rejected_total,
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+        }
+
+    async def _work(self, queue: asyncio.Queue[Update]) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                result = await self.dp.feed_update(self.bot, update)
+                if isinstance(result, TelegramMethod):
+                    await self.dp.silent_call_request(bot=self.bot, result=result)
+                self.processed_total += 1
+            except Exception:
+                self.failed_total += 1
+                logger.exception("Update %s failed", update.update_id)
+            finally:
+                queue.task_done()
+
+
+class ShardedRequestHandler(SimpleRequestHandler):
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, shards: UpdateShards, **kwargs: Any) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.shards = shards
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        payload = await request.json(loads=bot.session.json_loads)
+        update = Update.model_validate(payload, context={"bot": bot})
+        if not self.shards.submit(update):
+            # Telegram redelivers on non-2xx, so a full shard pushes the backlog back upstream.
+            return web.Response(status=503, text="Busy")
+        return web.json_response({}, dumps=bot.session.json_dumps)
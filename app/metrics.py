@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections.abc import Awaitable, Callable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, ParamSpec, TypeVar
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+if TYPE_CHECKING:
+    from app.db import Database
+    from app.ingest import UpdateShards
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HANDLER_LATENCY = Histogram(
+    "phusar_handler_seconds",
+    "Handler latency by router and handler.",
+    ["router", "handler"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "phusar_db_query_seconds",
+    "Database query latency by query fingerprint.",
+    ["query"],
+    buckets=_FAST_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter(
+    "phusar_db_query_errors_total",
+    "Database queries that raised, by query fingerprint.",
+    ["query"],
+)
+REDIS_LATENCY = Histogram(
+    "phusar_redis_seconds",
+    "Redis round trips made by the discovery service, by operation.",
+    ["operation"],
+    buckets=_FAST_BUCKETS,
+)
+TELEGRAM_LATENCY = Histogram(
+    "phusar_telegram_request_seconds",
+    "Bot API request latency by method.",
+    ["method"],
+)
+TELEGRAM_ERRORS = Counter(
+    "phusar_telegram_request_errors_total",
+    "Bot API requests that failed, by method and error.",
+    ["method", "error"],
+)
+OUTBOUND_RESULTS = Counter(
+    "phusar_outbound_messages_total",
+    "Queued notifications by lane and outcome.",
+    ["lane", "outcome"],
+)
+THROTTLE_DROPS = Counter(
+    "phusar_throttle_dropped_total",
+    "Events dropped by the throttling middleware, by action class.",
+    ["action"],
+)
+UPDATES_SUPPRESSED = Counter(
+    "phusar_updates_suppressed_total",
+    "Replayed updates dropped by update_id.",
+)
+PROFILE_CACHE_LOOKUPS = Counter(
+    "phusar_profile_cache_lookups_total",
+    "Profile cache lookups by the tier that answered (local, redis) or miss.",
+    ["result"],
+)
+PROFILE_CACHE_AGE = Histogram(
+    "phusar_profile_cache_age_seconds",
+    "Time since a served cached profile was read from or written to Postgres, by tier.",
+    ["tier"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+PROFILE_CACHE_EVICTIONS = Counter(
+    "phusar_profile_cache_evictions_total",
+    "Local profile cache entries dropped because another replica changed them (remote) or pub/sub reconnected.",
+    ["reason"],
+)
+SEEN_FILTER_EVENTS = Counter(
+    "phusar_seen_filter_events_total",
+    "Seen-filter builds, refills that lost their filter (missing) and candidate rows it dropped (flagged) "
+    "or that passed it but were already swiped (verified_swiped).",
+    ["event"],
+)
+
+_TABLE_PATTERN = re.compile(r"\b(?:from|into|update|join)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+_MAX_QUERY_SERIES = 512
+_MAX_TRACE_SPANS = 256
+
+# Label children are created once per query string / handler and reused, so observing a
+# sample on the hot path is a dict lookup plus the histogram update.
+_query_series: dict[str, tuple[str, Any, Any]] = {}
+_handler_series: dict[tuple[str, Callable[..., Any]], Any] = {}
+
+
+@dataclass(slots=True)
+class UpdateTrace:
+    # Time spent in DB, Redis and Bot API calls while one update is handled.
+    handler: str | None = None
+    totals: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    spans: list[tuple[str, str, float]] = field(default_factory=list)
+
+    def add(self, kind: str, label: str, seconds: float) -> None:
+        self.totals[kind] = self.totals.get(kind, 0.0) + seconds
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if len(self.spans) < _MAX_TRACE_SPANS:
+            self.spans.append((kind, label, seconds))
+
+
+# Set by the slow-update middleware for the duration of one update; None means nobody is tracing.
+current_trace: ContextVar[UpdateTrace | None] = ContextVar("current_trace", default=None)
+
+
+def _trace(kind: str, label: str, seconds: float) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(kind, label, seconds)
+
+
+def query_fingerprint(query: str) -> str:
+    normalized = " ".join(query.split())
+    verb = normalized.split(" ", 1)[0].lower() if normalized else "unknown"
+    if verb == "with":
+        verb = "cte"
+    table_match = _TABLE_PATTERN.search(normalized)
+    table = table_match.group(1).lower() if table_match else "none"
+    return f"{verb}:{table}:{zlib.crc32(normalized.encode()):08x}"
+
+
+def _query_children(query: str) -> tuple[str, Any, Any]:
+    children = _query_series.get(query)
+    if children is None:
+        label = query_fingerprint(query) if len(_query_series) < _MAX_QUERY_SERIES else "other"
+        children = (label, DB_QUERY_LATENCY.labels(label), DB_QUERY_ERRORS.labels(label))
+        _query_series[query] = children
+    return children
+
+
+def observe_db_query(query: str, seconds: float, failed: bool = False) -> None:
+    label, latency, errors = _query_children(query)
+    latency.observe(seconds)
+    if failed:
+        errors.inc()
+    _trace("db", label, seconds)
+
+
+def observe_redis(operation: str) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+    histogram = REDIS_LATENCY.labels(operation)
+
+    def decorator(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            started = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - started
+                histogram.observe(elapsed)
+                _trace("redis", operation, elapsed)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_telegram(method: str, seconds: float, error: str | None = None) -> None:
+    TELEGRAM_LATENCY.labels(method).observe(seconds)
+    if error is not None:
+        TELEGRAM_ERRORS.labels(method, error).inc()
+    _trace("telegram", method, seconds)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = perf_counter() - started
+            handler_object = data.get("handler")
+            callback = getattr(handler_object, "callback", None)
+            router = data.get("event_router")
+            router_name = getattr(router, "name", "unknown")
+            key = (router_name, callback)
+            series = _handler_series.get(key)
+            if series is None:
+                series = HANDLER_LATENCY.labels(router_name, getattr(callback, "__name__", "unknown"))
+                _handler_series[key] = series
+            series.observe(elapsed)
+            trace = current_trace.get()
+            if trace is not None:
+                trace.handler = f"{router_name}.{getattr(callback, '__name__', 'unknown')}"
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        started = perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except Exception as exc:
+            observe_telegram(method.__api_method__, perf_counter() - started, type(exc).__name__)
+            raise
+        observe_telegram(method.__api_method__, perf_counter() - started)
+        return response
+
+
+class _RuntimeCollector(Collector):
+    def __init__(self) -> None:
+        self.db: Database | None = None
+        self.shards: UpdateShards | None = None
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        if self.db is not None:
+            stats = self.db.pool_stats()
+            for name in ("size", "checked_out", "idle", "overflow", "max_size"):
+                yield GaugeMetricFamily(f"phusar_db_pool_{name}", f"Database pool {name.replace('_', ' ')}.", stats[name])
+        if self.shards is not None:
+            stats = self.shards.stats()
+            yield GaugeMetricFamily("phusar_webhook_queued", "Updates waiting in webhook shards.", stats["queued"])
+            yield GaugeMetricFamily("phusar_webhook_max_shard_depth", "Deepest webhook shard queue.", stats["max_depth"])
+            yield GaugeMetricFamily("phusar_webhook_rejected", "Updates refused because a shard was full.", stats["rejected_total"])
+
+
+_runtime_collector = _RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+
+def bind_runtime(db: Database | None = None, shards: UpdateShards | None = None) -> None:
+    if db is not None:
+        _runtime_collector.db = db
+    if shards is not None:
+        _runtime_collector.shards = shards
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def serve_metrics(port: int) -> None:
+    # For processes without the aiohttp app (polling, bus workers).
+    if port > 0:
+        start_http_server(port)
@@ -1,3 +1,6 @@
+from app.middlewares.dedupe import UpdateDedupeMiddleware
+from app.middlewares.profiler import SlowUpdateMiddleware
 from app.middlewares.throttling import ThrottlingMiddleware
+from app.middlewares.viewer import ViewerMiddleware
 
-__all__ = ["ThrottlingMiddleware"]
+__all__ = ["SlowUpdateMiddleware", "ThrottlingMiddleware", "UpdateDedupeMiddleware", "ViewerMiddleware"]
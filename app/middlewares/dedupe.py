@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.metrics import UPDATES_SUPPRESSED
+
+logger = logging.getLogger(__name__)
+
+# update_id grows by one per update, so one bit per update in fixed-size bitmap chunks
+# (128 KiB per 2^20 updates) is enough to remember what we already handled.
+_CHUNK_BITS = 20
+_CHUNK_TTL_SECONDS = 2 * 24 * 60 * 60
+# Claimed while a handler runs, so a concurrent duplicate is dropped; short enough to lapse
+# before the update bus hands a crashed worker's entries to another worker.
+_IN_PROGRESS_SECONDS = 15
+
+# KEYS: bitmap chunk, in-progress key; ARGV: bit offset, in-progress ttl. Returns 1 when the
+# caller should handle the update.
+_CLAIM_SCRIPT = """
+if redis.call('GETBIT', KEYS[1], tonumber(ARGV[1])) == 1 then
+    return 0
+end
+if redis.call('SET', KEYS[2], '1', 'NX', 'EX', tonumber(ARGV[2])) then
+    return 1
+end
+return 0
+"""
+
+
+class UpdateDedupeMiddleware(BaseMiddleware):
+    def __init__(self, redis_client: Redis, ttl_seconds: int = _CHUNK_TTL_SECONDS) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.suppressed_total = 0
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        if not await self._claim_update(event.update_id):
+            self.suppressed_total += 1
+            UPDATES_SUPPRESSED.inc()
+            logger.info("Suppressed replayed update %s", event.update_id)
+            return None
+        # The update only counts as handled once the handler returns: one that failed, was
+        # cancelled or died with its worker is handled again when it is redelivered.
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await self._release(event.update_id)
+            raise
+        await self._mark_handled(event.update_id)
+        return result
+
+    @staticmethod
+    def _keys(update_id: int) -> tuple[str, int, str]:
+        return (
+            f"processed_updates:{update_id >> _CHUNK_BITS}",
+            update_id & ((1 << _CHUNK_BITS) - 1),
+            f"processing_update:{update_id}",
+        )
+
+    async def _claim_update(self, update_id: int) -> bool:
+        chunk_key, offset, claim_key = self._keys(update_id)
+        try:
+            return bool(await self._claim(keys=[chunk_key, claim_key], args=[offset, _IN_PROGRESS_SECONDS]))
+        except RedisError:
+            return True
+
+    async def _mark_handled(self, update_id: int) -> None:
+        chunk_key, offset, claim_key = self._keys(update_id)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.setbit(chunk_key, offset, 1)
+                pipe.expire(chunk_key, self.ttl_seconds)
+                pipe.delete(claim_key)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Could not mark update %s as handled", update_id, exc_info=True)
+
+    async def _release(self, update_id: int) -> None:
+        try:
+            await self.redis.delete(self._keys(update_id)[2])
+        except RedisError:
+            # The claim expires on its own.
+            pass
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from itertools import count
+from pathlib import Path
+from time import perf_counter, strftime
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.metrics import UpdateTrace, current_trace
+
+logger = logging.getLogger(__name__)
+
+_TOP_SPANS = 5
+
+
+class SlowUpdateMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        threshold_ms: int = 1000,
+        profile_every: int = 0,
+        profile_dir: str | Path = "profiles",
+    ) -> None:
+        self.threshold_seconds = threshold_ms / 1000
+        # Profile 1 in N updates and keep the profile only when that update turns out slow,
+        # which samples roughly 1 in N slow updates without profiling everything.
+        self.profile_every = profile_every
+        self.profile_dir = Path(profile_dir)
+        self._updates = count(1)
+        self._profiling = False
+        self.slow_total = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        trace = UpdateTrace()
+        token = current_trace.set(trace)
+        profiler = self._start_profiler()
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            current_trace.reset(token)
+            if elapsed >= self.threshold_seconds:
+                self.slow_total += 1
+                await self._report(event, trace, elapsed, profiler)
+
+    def _start_profiler(self) -> cProfile.Profile | None:
+        # cProfile hooks the whole thread, so at most one update is profiled at a time and the
+        # profile also contains whatever other tasks ran meanwhile.
+        if self.profile_every <= 0 or self._profiling or next(self._updates) % self.profile_every:
+            return None
+        self._profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    async def _report(
+        self,
+        event: TelegramObject,
+        trace: UpdateTrace,
+        elapsed: float,
+        profiler: cProfile.Profile | None,
+    ) -> None:
+        update_id = event.update_id if isinstance(event, Update) else None
+        accounted = sum(trace.totals.values())
+        breakdown: dict[str, Any] = {
+            "update_id": update_id,
+            "event": event.event_type if isinstance(event, Update) else type(event).__name__,
+            "handler": trace.handler,
+            "total_ms": round(elapsed * 1000, 1),
+            "other_ms": round(max(0.0, elapsed - accounted) * 1000, 1),
+        }
+        for kind in ("db", "redis", "telegram"):
+            breakdown[kind] = {
+                "calls": trace.counts.get(kind, 0),
+                "ms": round(trace.totals.get(kind, 0.0) * 1000, 1),
+            }
+        slowest = sorted(trace.spans, key=lambda span: span[2], reverse=True)[:_TOP_SPANS]
+        breakdown["slowest"] = [[kind, label, round(seconds * 1000, 1)] for kind, label, seconds in slowest]
+        if profiler is not None:
+            path = self.profile_dir / f"update-{update_id}-{strftime('%Y%m%dT%H%M%S')}.pstats"
+            try:
+                await asyncio.to_thread(self._dump_profile, profiler, path)
+                breakdown["profile"] = str(path)
+            except OSError:
+                logger.exception("Could not write profile to %s", path)
+        logger.warning("Slow update %s", json.dumps(breakdown, ensure_ascii=False))
+
+    def _dump_profile(self, profiler: cProfile.Profile, path: Path) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
@@ -1,19 +1,83 @@
 from __future__ import annotations
 
+import math
+from collections import OrderedDict
 from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from time import monotonic
 from typing import Any
 
 from aiogram import BaseMiddleware
 from aiogram.exceptions import TelegramAPIError
 from aiogram.types import CallbackQuery, Message, TelegramObject
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.metrics import THROTTLE_DROPS
+
+# (tokens per second, burst) per action class.
+DEFAULT_THROTTLE_LIMITS: dict[str, tuple[float, int]] = {
+    "swipe": (1.0, 3),
+    "command": (1.0, 3),
+    "report": (0.1, 3),
+    "default": (2.0, 4),
+}
+
+# Token bucket shared by every replica. Grants up to ARGV[3] tokens at once so the caller can
+# spend them locally; returns {granted, retry_after_ms}.
+_TAKE_TOKENS_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local granted = math.min(wanted, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+local retry_after_ms = 0
+if granted == 0 then
+    retry_after_ms = math.ceil((1 - tokens) / rate * 1000)
+end
+return {granted, retry_after_ms}
+"""
+
+_WARN_INTERVAL_SECONDS = 3.0
+# A replica leases what the bucket refills in this window (at least two tokens, at most the
+# burst) and forfeits whatever it has not spent when the window ends. Leased tokens are taken
+# from the shared bucket, so a lease never adds tokens; it only lets one replica hold a few
+# that another replica then cannot use, and never for longer than the window.
+_LEASE_SECONDS = 2.0
+_MIN_LEASE = 2
+
+
+@dataclass(slots=True)
+class _LocalState:
+    tokens: int = 0
+    tokens_expire_at: float = 0.0
+    blocked_until: float = 0.0
+    last_warn_at: float = 0.0
 
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, min_interval_seconds: float = 1.0) -> None:
-        self.min_interval_seconds = min_interval_seconds
-        self._last_action_at: dict[int, float] = {}
-        self._last_warn_at: dict[int, float] = {}
+    def __init__(
+        self,
+        redis_client: Redis,
+        limits: dict[str, tuple[float, int]] | None = None,
+        max_local_entries: int = 10_000,
+    ) -> None:
+        self.redis = redis_client
+        self.limits = limits or DEFAULT_THROTTLE_LIMITS
+        self.max_local_entries = max_local_entries
+        self._take_tokens = redis_client.register_script(_TAKE_TOKENS_SCRIPT)
+        # Front cache of tokens leased from Redis and known blocks, bounded by plain LRU.
+        self._local: OrderedDict[tuple[int, str], _LocalState] = OrderedDict()
+        self.dropped_total = 0
+        self._drop_counters = {action_class: THROTTLE_DROPS.labels(action_class) for action_class in self.limits}
 
     async def __call__(
         self,
@@ -26,14 +90,70 @@ class ThrottlingMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         now = monotonic()
-        last = self._last_action_at.get(user_id)
-        if last is not None and now - last < self.min_interval_seconds:
-            await self._warn_if_needed(event, user_id, now)
+        action_class = self._action_class(event)
+        state = self._local_state(user_id, action_class)
+        if not await self._allow(user_id, action_class, state, now):
+            self.dropped_total += 1
+            self._drop_counters.get(action_class, self._drop_counters["default"]).inc()
+            await self._warn_if_needed(event, state, now)
             return None
-
-        self._last_action_at[user_id] = now
         return await handler(event, data)
 
+    @staticmethod
+    def _action_class(event: TelegramObject) -> str:
+        if isinstance(event, CallbackQuery):
+            payload = event.data or ""
+            if payload.startswith("act:"):
+                return "swipe"
+            # Only the user report flow; report_cancel and the admin report_admin: buttons are
+            # ordinary callbacks.
+            if payload.startswith(("report:", "report_reason:")):
+                return "report"
+            return "default"
+        if isinstance(event, Message) and event.text and event.text.startswith("/"):
+            return "command"
+        return "default"
+
+    def _local_state(self, user_id: int, action_class: str) -> _LocalState:
+        key = (user_id, action_class)
+        state = self._local.get(key)
+        if state is not None:
+            self._local.move_to_end(key)
+            return state
+        # Plain LRU, live entries included: Redis holds the real bucket, so evicting one only
+        # forgets a block (the next call asks Redis again) or gives back unspent leased tokens.
+        while len(self._local) >= self.max_local_entries:
+            self._local.popitem(last=False)
+        state = _LocalState()
+        self._local[key] = state
+        return state
+
+    async def _allow(self, user_id: int, action_class: str, state: _LocalState, now: float) -> bool:
+        if state.blocked_until > now:
+            return False
+        if state.tokens > 0 and state.tokens_expire_at > now:
+            state.tokens -= 1
+            return True
+
+        rate, burst = self.limits.get(action_class, self.limits["default"])
+        lease = min(burst, max(_MIN_LEASE, math.ceil(rate * _LEASE_SECONDS)))
+        try:
+            granted, retry_after_ms = await self._take_tokens(
+                keys=[f"throttle:{action_class}:{user_id}"],
+                args=[rate, burst, lease],
+            )
+        except RedisError:
+            # Fail open: a Redis outage must not lock every user out.
+            return True
+        granted = int(granted)
+        if granted <= 0:
+            state.tokens = 0
+            state.blocked_until = now + int(retry_after_ms) / 1000
+            return False
+        state.tokens = granted - 1
+        state.tokens_expire_at = now + _LEASE_SECONDS
+        return True
+
     @staticmethod
     def _extract_user_id(event: TelegramObject, data: dict[str, Any]) -> int | None:
         if isinstance(event, Message) and event.from_user is not None:
@@ -49,12 +169,10 @@ class ThrottlingMiddleware(BaseMiddleware):
                 return None
         return None
 
-    async def _warn_if_needed(self, event: TelegramObject, user_id: int, now: float) -> None:
-        warn_interval = 3.0
-        last_warn = self._last_warn_at.get(user_id, 0.0)
-        if now - last_warn < warn_interval:
+    async def _warn_if_needed(self, event: TelegramObject, state: _LocalState, now: float) -> None:
+        if now - state.last_warn_at < _WARN_INTERVAL_SECONDS:
             return
-        self._last_warn_at[user_id] = now
+        state.last_warn_at = now
 
         try:
             if isinstance(event, CallbackQuery):
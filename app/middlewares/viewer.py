@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.repositories import UserRepository
+
+
+class ViewerMiddleware(BaseMiddleware):
+    def __init__(self, users: UserRepository) -> None:
+        self.users = users
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        # Every users.get() inside the handler, including repeats after writes, is answered
+        # from this update's scope; only the first read reaches Postgres.
+        token = self.users.open_scope()
+        try:
+            from_user = data.get("event_from_user")
+            data["viewer"] = await self.users.get(from_user.id) if from_user is not None else None
+            return await handler(event, data)
+        finally:
+            self.users.close_scope(token)
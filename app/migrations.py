@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import asyncpg
+
+from app.config import Settings
+from app.db import Database
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "db" / "migrations"
+# Files starting with this line run statement by statement outside a transaction, which
+# CREATE INDEX CONCURRENTLY requires.
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+# Arbitrary constant shared by every replica so only one of them migrates at a time.
+_ADVISORY_LOCK_ID = 7_305_812_311
+_LOCK_POLL_SECONDS = 0.5
+_FILENAME_PATTERN = re.compile(r"^(\d+)_([a-z0-9_]+)\.sql$")
+_CREATE_INDEX_PATTERN = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?([a-z_][a-z0-9_]*)\s",
+    re.IGNORECASE,
+)
+
+_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations: dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME_PATTERN.match(path.name)
+        if match is None:
+            raise MigrationError(f"Unexpected migration file name: {path.name}")
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: {path.name}")
+        sql = path.read_text(encoding="utf-8")
+        migrations[version] = Migration(
+            version=version,
+            name=match.group(2),
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION_MARKER),
+        )
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def _applied_checksums(conn: asyncpg.Connection) -> dict[int, str] | None:
+    try:
+        rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return None
+    return {int(row["version"]): row["checksum"] for row in rows}
+
+
+def _pending(migrations: list[Migration], applied: dict[int, str]) -> list[Migration]:
+    pending: list[Migration] = []
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is None:
+            pending.append(migration)
+        elif checksum != migration.checksum:
+            raise MigrationError(
+                f"Migration {migration.version}_{migration.name} was changed after it was applied."
+            )
+    return pending
+
+
+async def _index_valid(conn: asyncpg.Connection, name: str) -> bool | None:
+    # None when the index does not exist.
+    return await conn.fetchval(
+        """
+        SELECT i.indisvalid
+        FROM pg_index AS i
+        JOIN pg_class AS c ON c.oid = i.indexrelid
+        WHERE c.relname = $1 AND pg_table_is_visible(c.oid)
+        """,
+        name.lower(),
+    )
+
+
+async def _apply(conn: asyncpg.Connection, migration: Migration) -> None:
+    record = "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)"
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.name, migration.checksum)
+        return
+    statements = [item.strip() for item in migration.sql.split(";") if item.strip()]
+    created: list[str] = []
+    for statement in statements:
+        match = _CREATE_INDEX_PATTERN.match(statement.removeprefix(NO_TRANSACTION_MARKER).strip())
+        if match is not None:
+            # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+            # IF NOT EXISTS would then skip: drop it so the retry builds it again.
+            name = match.group(1)
+            if await _index_valid(conn, name) is False:
+                logger.warning("Dropping invalid index %s left by an earlier attempt", name)
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            created.append(name)
+        await conn.execute(statement)
+    # Only record the file once every index it creates is usable.
+    for name in created:
+        if not await _index_valid(conn, name):
+            raise MigrationError(f"Index {name} from migration {migration.version}_{migration.name} is not valid.")
+    await conn.execute(record, migration.version, migration.name, migration.checksum)
+
+
+async def migrate(db: Database, directory: Path = MIGRATIONS_DIR) -> list[int]:
+    migrations = load_migrations(directory)
+    async with db.raw_connection() as conn:
+        # Fast path for every boot after the first: one SELECT, no catalog locks.
+        applied = await _applied_checksums(conn)
+        if applied is not None and not _pending(migrations, applied):
+            return []
+
+        # Poll instead of blocking in pg_advisory_lock(): a waiting statement is an open
+        # transaction, and CREATE INDEX CONCURRENTLY on the lock holder waits for those.
+        while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _ADVISORY_LOCK_ID):
+            await asyncio.sleep(_LOCK_POLL_SECONDS)
+        try:
+            await conn.execute(_CREATE_TABLE_SQL)
+            # Another replica may have migrated while we waited for the lock.
+            pending = _pending(migrations, await _applied_checksums(conn) or {})
+            for migration in pending:
+                logger.info("Applying migration %s_%s", migration.version, migration.name)
+                await _apply(conn, migration)
+            return [migration.version for migration in pending]
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _ADVISORY_LOCK_ID)
+
+
+async def _run() -> None:
+    settings = Settings.from_env()
+    db = Database(settings.database_url, backend=settings.database_backend)
+    await db.connect()
+    try:
+        applied = await migrate(db)
+        logger.info("Applied migrations: %s", applied or "none")
+    finally:
+        await db.close()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
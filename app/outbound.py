@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from time import monotonic, time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import InlineKeyboardMarkup
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.metrics import OUTBOUND_RESULTS
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order: the take script serves the first non-empty one.
+OUTBOUND_LANES = ("match", "like", "notice", "admin")
+_PROMOTE_INTERVAL_SECONDS = 0.5
+_PROMOTE_BATCH = 100
+_MAX_CHAT_ENTRIES = 10_000
+_IDLE_POLL_SECONDS = 0.1
+_ERROR_BACKOFF_SECONDS = 1.0
+_MAX_ERROR_BACKOFF_SECONDS = 30.0
+# Consumers heartbeat into outbound:consumers; the processing lists of one that has been
+# silent this long (crashed or killed) go back to the front of their lanes.
+_HEARTBEAT_INTERVAL_SECONDS = 5.0
+_CONSUMER_STALE_SECONDS = 60.0
+_CONSUMERS_KEY = "outbound:consumers"
+_RATE_KEY = "outbound:rate"
+
+# Moves due entries from each outbound:delayed:{lane} sorted set back onto outbound:{lane}.
+# KEYS alternate delayed set / lane list.
+_PROMOTE_DUE_SCRIPT = """
+local moved = 0
+for index = 1, #KEYS, 2 do
+    local due = redis.call('ZRANGEBYSCORE', KEYS[index], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+    for _, payload in ipairs(due) do
+        redis.call('ZREM', KEYS[index], payload)
+        redis.call('RPUSH', KEYS[index + 1], payload)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+# Moves the head of the first non-empty lane onto this consumer's processing list for that
+# lane, where it stays until it is sent or deferred. KEYS alternate lane list / processing
+# list; returns {lane index, payload} or nil.
+_TAKE_SCRIPT = """
+for index = 1, #KEYS, 2 do
+    local payload = redis.call('LMOVE', KEYS[index], KEYS[index + 1], 'LEFT', 'RIGHT')
+    if payload then
+        return {(index - 1) / 2, payload}
+    end
+end
+return nil
+"""
+
+# Puts a consumer's processing lists back at the front of their lanes in their original order
+# and forgets the consumer. KEYS: consumers zset, then alternate lane list / processing list;
+# ARGV[1]: consumer id.
+_REQUEUE_SCRIPT = """
+local moved = 0
+for index = 2, #KEYS, 2 do
+    while redis.call('LMOVE', KEYS[index + 1], KEYS[index], 'RIGHT', 'LEFT') do
+        moved = moved + 1
+    end
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+return moved
+"""
+
+# Token bucket shared by every replica. Always takes a token and returns how many ms the
+# caller has to wait for it, so concurrent senders queue up instead of retrying.
+_RESERVE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+if tokens >= 0 then
+    return 0
+end
+return math.ceil(-tokens / rate * 1000)
+"""
+
+
+class OutboundDispatcher:
+    def __init__(
+        self,
+        bot: Bot,
+        redis_client: Redis,
+        rate_per_second: float = 25.0,
+        chat_interval_seconds: float = 1.0,
+        concurrency: int = 8,
+        max_attempts: int = 5,
+    ) -> None:
+        self.bot = bot
+        self.redis = redis_client
+        self.chat_interval_seconds = chat_interval_seconds
+        self.max_attempts = max_attempts
+        self.rate_per_second = rate_per_second
+        self.consumer_id = uuid.uuid4().hex
+        self._chat_next_at: dict[int, float] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._promote_keys = [key for lane in OUTBOUND_LANES for key in (self._delayed_key(lane), self._lane_key(lane))]
+        self._take_keys = [
+            key for lane in OUTBOUND_LANES for key in (self._lane_key(lane), self._processing_key(self.consumer_id, lane))
+        ]
+        self._promote_script = redis_client.register_script(_PROMOTE_DUE_SCRIPT)
+        self._take_script = redis_client.register_script(_TAKE_SCRIPT)
+        self._requeue_script = redis_client.register_script(_REQUEUE_SCRIPT)
+        self._reserve_script = redis_client.register_script(_RESERVE_SCRIPT)
+        self._runner: asyncio.Task[None] | None = None
+        self._deliveries: set[asyncio.Task[None]] = set()
+
+    @staticmethod
+    def _lane_key(lane: str) -> str:
+        return f"outbound:{lane}"
+
+    @staticmethod
+    def _delayed_key(lane: str) -> str:
+        return f"outbound:delayed:{lane}"
+
+    @staticmethod
+    def _processing_key(consumer_id: str, lane: str) -> str:
+        return f"outbound:processing:{consumer_id}:{lane}"
+
+    async def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="outbound-dispatcher")
+
+    async def close(self) -> None:
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+        # Let sends that already started finish; everything else stays in Redis.
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+        try:
+            await self._requeue(self.consumer_id)
+        except RedisError:
+            logger.warning("Outbound processing lists not requeued; another replica will pick them up", exc_info=True)
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        lane: str = "notice",
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        await self._enqueue(lane, {"kind": "message", "chat_id": chat_id, "text": text}, reply_markup)
+
+    async def send_photo(
+        self,
+        chat_id: int,
+        photo: str,
+        lane: str = "notice",
+        caption: str | None = None,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        await self._enqueue(
+            lane,
+            {"kind": "photo", "chat_id": chat_id, "photo": photo, "caption": caption},
+            reply_markup,
+        )
+
+    async def _enqueue(
+        self,
+        lane: str,
+        payload: dict[str, Any],
+        reply_markup: InlineKeyboardMarkup | None,
+    ) -> None:
+        if lane not in OUTBOUND_LANES:
+            raise ValueError(f"Unknown outbound lane: {lane}")
+        payload["id"] = uuid.uuid4().hex
+        payload["lane"] = lane
+        payload["attempt"] = 0
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup.model_dump(exclude_none=True)
+        await self.redis.rpush(self._lane_key(lane), json.dumps(payload))
+
+    async def _run(self) -> None:
+        next_promote_at = 0.0
+        next_heartbeat_at = 0.0
+        backoff = _ERROR_BACKOFF_SECONDS
+        while True:
+            try:
+                now = monotonic()
+                if now >= next_heartbeat_at:
+                    # Also runs on startup, which requeues what a crashed replica had taken.
+                    await self._heartbeat()
+                    next_heartbeat_at = now + _HEARTBEAT_INTERVAL_SECONDS
+                if now >= next_promote_at:
+                    await self._promote_script(keys=self._promote_keys, args=[time(), _PROMOTE_BATCH])
+                    next_promote_at = now + _PROMOTE_INTERVAL_SECONDS
+                await self._dispatch_next()
+                backoff = _ERROR_BACKOFF_SECONDS
+            except RedisError:
+                logger.warning("Outbound dispatcher Redis error; retrying in %.0fs", backoff, exc_info=True)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, _MAX_ERROR_BACKOFF_SECONDS)
+
+    async def _dispatch_next(self) -> None:
+        await self._slots.acquire()
+        try:
+            taken = await self._take_script(keys=self._take_keys)
+        except BaseException:
+            self._slots.release()
+            raise
+        if taken is None:
+            self._slots.release()
+            await asyncio.sleep(_IDLE_POLL_SECONDS)
+            return
+
+        lane, raw = OUTBOUND_LANES[int(taken[0])], taken[1]
+        try:
+            payload = json.loads(raw)
+            chat_id = int(payload["chat_id"])
+        except (ValueError, TypeError, KeyError):
+            self._slots.release()
+            OUTBOUND_RESULTS.labels(lane, "failed").inc()
+            logger.error("Dropping malformed outbound entry on %s: %.200s", lane, raw)
+            await self.redis.lrem(self._processing_key(self.consumer_id, lane), 1, raw)
+            return
+
+        chat_wait = self._reserve_chat(chat_id)
+        if chat_wait > 0:
+            self._slots.release()
+            await self._defer(payload, chat_wait, raw)
+            return
+
+        try:
+            delay = int(await self._reserve_script(keys=[_RATE_KEY], args=[self.rate_per_second, self.rate_per_second]))
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+        except BaseException:
+            # Not sent: the entry goes back to the front of its lane (or, if Redis is down, stays
+            # on the processing list until the next requeue).
+            self._slots.release()
+            await asyncio.shield(self._release(lane, raw))
+            raise
+
+        task = asyncio.create_task(self._deliver(payload, raw))
+        self._deliveries.add(task)
+        task.add_done_callback(self._delivery_done)
+
+    async def _heartbeat(self) -> None:
+        now = time()
+        await self.redis.zadd(_CONSUMERS_KEY, {self.consumer_id: now})
+        stale = await self.redis.zrangebyscore(_CONSUMERS_KEY, "-inf", now - _CONSUMER_STALE_SECONDS)
+        for consumer_id in stale:
+            moved = await self._requeue(consumer_id)
+            if moved:
+                logger.warning("Requeued %s outbound messages from stale consumer %s", moved, consumer_id)
+
+    async def _requeue(self, consumer_id: str) -> int:
+        keys = [_CONSUMERS_KEY]
+        for lane in OUTBOUND_LANES:
+            keys.extend((self._lane_key(lane), self._processing_key(consumer_id, lane)))
+        return int(await self._requeue_script(keys=keys, args=[consumer_id]))
+
+    async def _release(self, lane: str, raw: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self._processing_key(self.consumer_id, lane), 1, raw)
+            pipe.lpush(self._lane_key(lane), raw)
+            await pipe.execute()
+
+    def _delivery_done(self, task: asyncio.Task[None]) -> None:
+        self._deliveries.discard(task)
+        self._slots.release()
+
+    def _reserve_chat(self, chat_id: int) -> float:
+        now = monotonic()
+        next_at = self._chat_next_at.get(chat_id, 0.0)
+        if next_at > now:
+            return next_at - now
+        if len(self._chat_next_at) >= _MAX_CHAT_ENTRIES:
+            self._chat_next_at = {key: value for key, value in self._chat_next_at.items() if value > now}
+        self._chat_next_at[chat_id] = now + self.chat_interval_seconds
+        return 0.0
+
+    async def _defer(self, payload: dict[str, Any], delay: float, raw: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self._delayed_key(payload["lane"]), {json.dumps(payload): time() + delay})
+            pipe.lrem(self._processing_key(self.consumer_id, payload["lane"]), 1, raw)
+            await pipe.execute()
+
+    async def _done(self, lane: str, raw: str) -> None:
+        await self.redis.lrem(self._processing_key(self.consumer_id, lane), 1, raw)
+
+    async def _deliver(self, payload: dict[str, Any], raw: str) -> None:
+        try:
+            await self._attempt(payload, raw)
+        except RedisError:
+            # The entry is still on the processing list; it is sent again after the next requeue.
+            logger.warning("Outbound bookkeeping failed for %s", payload["id"], exc_info=True)
+
+    async def _attempt(self, payload: dict[str, Any], raw: str) -> None:
+        chat_id = int(payload["chat_id"])
+        lane = payload["lane"]
+        try:
+            await self._send(payload)
+            OUTBOUND_RESULTS.labels(lane, "sent").inc()
+        except TelegramRetryAfter as exc:
+            self._chat_next_at[chat_id] = monotonic() + exc.retry_after
+            OUTBOUND_RESULTS.labels(lane, "retry_after").inc()
+            await self._defer(payload, float(exc.retry_after), raw)
+            return
+        except (TelegramNetworkError, TelegramServerError) as exc:
+            payload["attempt"] = int(payload.get("attempt", 0)) + 1
+            if payload["attempt"] < self.max_attempts:
+                OUTBOUND_RESULTS.labels(lane, "retried").inc()
+                await self._defer(payload, float(2 ** payload["attempt"]), raw)
+                return
+            OUTBOUND_RESULTS.labels(lane, "dropped").inc()
+            logger.warning(
+                "Dropping outbound %s to %s after %s attempts: %s",
+                payload["kind"],
+                chat_id,
+                payload["attempt"],
+                exc,
+            )
+        except TelegramAPIError as exc:
+            OUTBOUND_RESULTS.labels(lane, "rejected").inc()
+            logger.info("Dropping outbound %s to %s: %s", payload["kind"], chat_id, exc)
+        except Exception:
+            OUTBOUND_RESULTS.labels(lane, "failed").inc()
+            logger.exception("Outbound %s to %s failed", payload["kind"], chat_id)
+        await self._done(lane, raw)
+
+    async def _send(self, payload: dict[str, Any]) -> None:
+        markup = payload.get("reply_markup")
+        reply_markup = InlineKeyboardMarkup.model_validate(markup) if markup else None
+        if payload["kind"] == "photo":
+            await self.bot.send_photo(
+                chat_id=int(payload["chat_id"]),
+                photo=payload["photo"],
+                caption=payload.get("caption"),
+                reply_markup=reply_markup,
+            )
+            return
+        await self.bot.send_message(int(payload["chat_id"]), payload["text"], reply_markup=reply_markup)
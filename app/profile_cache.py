@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime
+from time import monotonic, time
+from types import MappingProxyType
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.metrics import PROFILE_CACHE_AGE, PROFILE_CACHE_EVICTIONS, PROFILE_CACHE_LOOKUPS, observe_redis
+
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY_PREFIX = "profile:"
+PROFILE_INVALIDATION_CHANNEL = "profile:invalidate"
+_TOMBSTONE_TTL_SECONDS = 60
+_RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+_INT_COLUMNS = frozenset({"user_id", "age", "likes_today", "geo_cell_lat", "geo_cell_lon"})
+_FLOAT_COLUMNS = frozenset({"latitude", "longitude"})
+_BOOL_COLUMNS = frozenset({"is_premium", "is_banned"})
+_TIMESTAMP_COLUMNS = frozenset({"premium_until", "likes_reset_at", "created_at", "updated_at"})
+# Bookkeeping fields stored next to the columns in the hash.
+_NULLS_FIELD = "_nulls"
+_CACHED_AT_FIELD = "_cached_at"
+_DELETED_FIELD = "_deleted"
+
+# KEYS[1] profile hash; ARGV: mode ('write' | 'fill'), ttl, updated_at, field/value pairs.
+# A fill (after a DB read) never replaces anything, so it cannot race a concurrent write or a
+# delete tombstone; a write only loses to a newer updated_at from another replica.
+_STORE_PROFILE_SCRIPT = """
+if ARGV[1] == 'fill' and redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local stored = redis.call('HGET', KEYS[1], 'updated_at')
+if stored and ARGV[3] ~= '' and stored > ARGV[3] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+
+def _encode(row: Mapping[str, Any]) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    nulls: list[str] = []
+    for column, value in row.items():
+        if value is None:
+            nulls.append(column)
+        elif isinstance(value, bool):
+            fields[column] = "1" if value else "0"
+        elif isinstance(value, datetime):
+            # Fixed width so the Lua script can compare updated_at as strings.
+            fields[column] = value.isoformat(timespec="microseconds")
+        elif isinstance(value, float):
+            fields[column] = repr(value)
+        else:
+            fields[column] = str(value)
+    fields[_NULLS_FIELD] = ",".join(nulls)
+    return fields
+
+
+def _decode(fields: Mapping[str, str]) -> dict[str, Any]:
+    row: dict[str, Any] = {column: None for column in fields.get(_NULLS_FIELD, "").split(",") if column}
+    for column, raw in fields.items():
+        if column.startswith("_"):
+            continue
+        if column in _INT_COLUMNS:
+            row[column] = int(raw)
+        elif column in _FLOAT_COLUMNS:
+            row[column] = float(raw)
+        elif column in _BOOL_COLUMNS:
+            row[column] = raw == "1"
+        elif column in _TIMESTAMP_COLUMNS:
+            row[column] = datetime.fromisoformat(raw)
+        else:
+            row[column] = raw
+    return row
+
+
+class ProfileCache:
+    # Two tiers in front of `SELECT * FROM users`: a small per-process LRU with a short TTL, then
+    # one Redis hash per profile shared by every replica. UserRepository writes every RETURNING *
+    # row through, and a pub/sub message evicts the entry from the other replicas' LRU.
+    def __init__(
+        self,
+        redis_client: Redis,
+        ttl_seconds: int = 3600,
+        local_ttl_seconds: float = 5.0,
+        local_max_entries: int = 10_000,
+    ) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.local_ttl_seconds = local_ttl_seconds
+        self.local_max_entries = local_max_entries
+        self._store_profile = redis_client.register_script(_STORE_PROFILE_SCRIPT)
+        # user_id -> (local expiry on the monotonic clock, wall time the row was read, row)
+        self._local: OrderedDict[int, tuple[float, float, Mapping[str, Any]]] = OrderedDict()
+        self._origin = uuid.uuid4().hex[:12]
+        self._listener: asyncio.Task[None] | None = None
+        self._local_hits = PROFILE_CACHE_LOOKUPS.labels("local")
+        self._redis_hits = PROFILE_CACHE_LOOKUPS.labels("redis")
+        self._misses = PROFILE_CACHE_LOOKUPS.labels("miss")
+        self._local_age = PROFILE_CACHE_AGE.labels("local")
+        self._redis_age = PROFILE_CACHE_AGE.labels("redis")
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"{PROFILE_KEY_PREFIX}{user_id}"
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(), name="profile-cache-invalidation")
+
+    async def close(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    async def get(self, user_id: int) -> Mapping[str, Any] | None:
+        # None means "not cached"; the caller reads Postgres and calls fill().
+        row = self._get_local(user_id)
+        if row is not None:
+            return row
+        try:
+            fields = await self._read(user_id)
+        except RedisError:
+            logger.warning("Profile cache read failed for %s", user_id, exc_info=True)
+            fields = {}
+        return self.adopt(user_id, fields)
+
+    async def get_many(self, user_ids: list[int]) -> dict[int, Mapping[str, Any]]:
+        found: dict[int, Mapping[str, Any]] = {}
+        remote: list[int] = []
+        for user_id in user_ids:
+            row = self._get_local(user_id)
+            if row is None:
+                remote.append(user_id)
+            else:
+                found[user_id] = row
+        if not remote:
+            return found
+        try:
+            hashes = await self._read_many(remote)
+        except RedisError:
+            logger.warning("Profile cache batch read failed", exc_info=True)
+            hashes = [{} for _ in remote]
+        for user_id, fields in zip(remote, hashes):
+            row = self.adopt(user_id, fields)
+            if row is not None:
+                found[user_id] = row
+        return found
+
+    def adopt(self, user_id: int, fields: Mapping[str, str]) -> Mapping[str, Any] | None:
+        # Turns a profile hash read elsewhere (HGETALL, or a Lua script) into a cached row.
+        if not fields or _DELETED_FIELD in fields:
+            self._misses.inc()
+            return None
+        cached_at = float(fields.get(_CACHED_AT_FIELD) or time())
+        row = MappingProxyType(_decode(fields))
+        self._remember(user_id, row, cached_at)
+        self._redis_hits.inc()
+        self._redis_age.observe(max(0.0, time() - cached_at))
+        return row
+
+    async def fill(self, row: Mapping[str, Any]) -> None:
+        await self._write(row, "fill")
+
+    async def fill_many(self, rows: list[Mapping[str, Any]]) -> None:
+        if not rows:
+            return
+        batch: list[tuple[int, dict[str, str]]] = []
+        for row in rows:
+            snapshot = dict(row)
+            user_id = int(snapshot["user_id"])
+            batch.append((user_id, self._prepare(user_id, snapshot)))
+        try:
+            await self._store_many(batch)
+        except RedisError:
+            logger.warning("Profile cache batch fill failed", exc_info=True)
+
+    async def put(self, row: Mapping[str, Any]) -> None:
+        await self._write(row, "write")
+
+    async def evict(self, user_id: int) -> None:
+        self._local.pop(user_id, None)
+        try:
+            await self._tombstone(user_id)
+        except RedisError:
+            logger.warning("Profile cache eviction failed for %s", user_id, exc_info=True)
+
+    def _get_local(self, user_id: int) -> Mapping[str, Any] | None:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        expires_at, cached_at, row = entry
+        if expires_at <= monotonic():
+            del self._local[user_id]
+            return None
+        self._local.move_to_end(user_id)
+        self._local_hits.inc()
+        self._local_age.observe(max(0.0, time() - cached_at))
+        return row
+
+    def _remember(self, user_id: int, row: Mapping[str, Any], cached_at: float) -> None:
+        self._local[user_id] = (monotonic() + self.local_ttl_seconds, cached_at, row)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
+
+    def _prepare(self, user_id: int, snapshot: dict[str, Any]) -> dict[str, str]:
+        cached_at = time()
+        self._remember(user_id, MappingProxyType(snapshot), cached_at)
+        fields = _encode(snapshot)
+        fields[_CACHED_AT_FIELD] = repr(cached_at)
+        return fields
+
+    async def _write(self, row: Mapping[str, Any], mode: str) -> None:
+        snapshot = dict(row)
+        user_id = int(snapshot["user_id"])
+        fields = self._prepare(user_id, snapshot)
+        try:
+            await self._store(user_id, mode, fields)
+        except RedisError:
+            logger.warning("Profile cache %s failed for %s", mode, user_id, exc_info=True)
+
+    def _store_args(self, mode: str, fields: dict[str, str]) -> list[str]:
+        args: list[str] = [mode, str(self.ttl_seconds), fields.get("updated_at", "")]
+        for name, value in fields.items():
+            args.extend((name, value))
+        return args
+
+    @observe_redis("profile_get")
+    async def _read(self, user_id: int) -> dict[str, str]:
+        return await self.redis.hgetall(self._key(user_id))
+
+    @observe_redis("profile_get_many")
+    async def _read_many(self, user_ids: list[int]) -> list[dict[str, str]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(self._key(user_id))
+            return await pipe.execute()
+
+    @observe_redis("profile_store")
+    async def _store(self, user_id: int, mode: str, fields: dict[str, str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await self._store_profile(keys=[self._key(user_id)], args=self._store_args(mode, fields), client=pipe)
+            if mode == "write":
+                pipe.publish(PROFILE_INVALIDATION_CHANNEL, f"{self._origin}:{user_id}")
+            await pipe.execute()
+
+    @observe_redis("profile_fill_many")
+    async def _store_many(self, batch: list[tuple[int, dict[str, str]]]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, fields in batch:
+                await self._store_profile(keys=[self._key(user_id)], args=self._store_args("fill", fields), client=pipe)
+            await pipe.execute()
+
+    @observe_redis("profile_evict")
+    async def _tombstone(self, user_id: int) -> None:
+        # Keeps a fill from a read that started before the delete from resurrecting the profile.
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, _DELETED_FIELD, "1")
+            pipe.expire(key, _TOMBSTONE_TTL_SECONDS)
+            pipe.publish(PROFILE_INVALIDATION_CHANNEL, f"{self._origin}:{user_id}")
+            await pipe.execute()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PROFILE_INVALIDATION_CHANNEL)
+                    # Invalidations published while we were not subscribed are lost.
+                    if self._local:
+                        PROFILE_CACHE_EVICTIONS.labels("resubscribe").inc(len(self._local))
+                        self._local.clear()
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        origin, _, raw_user_id = str(message["data"]).partition(":")
+                        if origin == self._origin or not raw_user_id.isdigit():
+                            continue
+                        if self._local.pop(int(raw_user_id), None) is not None:
+                            PROFILE_CACHE_EVICTIONS.labels("remote").inc()
+            except RedisError:
+                logger.warning("Profile invalidation subscription lost; resubscribing", exc_info=True)
+                await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
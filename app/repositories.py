@@ -1,17 +1,217 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
 from datetime import datetime
+from math import cos, floor, radians
+from typing import TYPE_CHECKING
 
 import asyncpg
 
-from app.db import Database
+from app.db import Database, Row
 from app.utils import now_utc
 
+if TYPE_CHECKING:
+    from app.profile_cache import ProfileCache
+
+# Takes candidate ids in query order and returns the ones the viewer has not swiped, or None
+# when it cannot tell (the caller then runs the exact anti-join query).
+CandidateScreen = Callable[[list[int]], Awaitable[list[int] | None]]
+# Called after writes that can change whether or where a user shows up in discovery, with the
+# RETURNING * row, or None once the user is deleted.
+UserChangeListener = Callable[[int, Row | None], Awaitable[None]]
+
+_user_scope: ContextVar[dict[int, Row | None] | None] = ContextVar("user_scope", default=None)
+
+# Users are bucketed into 1/GEO_CELLS_PER_DEGREE degree lat/lon cells (see geo_cell_* columns in db/migrations/0002_geo_cells.sql).
+GEO_CELLS_PER_DEGREE = 10
+_GEO_RING_RADII = (1, 2, 4, 8, 16, 32, 64)
+_KM_PER_DEGREE = 111.19
+
+_CANDIDATE_DISTANCE_SQL = """
+    CASE
+        WHEN CAST($4 AS double precision) IS NULL
+             OR CAST($5 AS double precision) IS NULL
+             OR u.latitude IS NULL
+             OR u.longitude IS NULL
+            THEN NULL
+        ELSE 6371 * acos(
+            LEAST(1.0, GREATEST(-1.0,
+                cos(radians(CAST($4 AS double precision))) * cos(radians(u.latitude))
+                * cos(radians(u.longitude) - radians(CAST($5 AS double precision)))
+                + sin(radians(CAST($4 AS double precision))) * sin(radians(u.latitude))
+            ))
+        )
+    END
+"""
+
+
+def _candidate_filter_sql(exclude_swiped: bool) -> str:
+    # Without the anti-join the caller screens out swiped users itself (see DiscoveryService).
+    anti_join = """
+    LEFT JOIN actions a
+        ON a.actor_id = $1 AND a.target_id = u.user_id""" if exclude_swiped else ""
+    not_swiped = """
+      AND a.target_id IS NULL""" if exclude_swiped else ""
+    return f"""
+    FROM users u{anti_join}
+    WHERE u.user_id != $1
+      AND u.is_banned = FALSE
+      AND (
+          (CAST($2 AS text) = 'both' AND u.gender IN ('male', 'female'))
+          OR (CAST($2 AS text) IN ('male', 'female') AND u.gender = CAST($2 AS text))
+      )
+      AND (u.seeking = 'both' OR u.seeking = $3)
+      AND u.photo_id IS NOT NULL
+      AND u.age IS NOT NULL
+      AND u.location_region IS NOT NULL
+      AND u.township IS NOT NULL{not_swiped}
+"""
+
+
+def _candidate_scan_query(exclude_swiped: bool) -> str:
+    return f"""
+    WITH pool AS (
+        SELECT
+            u.user_id,
+            u.location_region,
+            u.created_at,
+            {_CANDIDATE_DISTANCE_SQL} AS distance_km
+        {_candidate_filter_sql(exclude_swiped)}
+    )
+    SELECT user_id
+    FROM pool
+    ORDER BY
+        CASE
+            WHEN distance_km IS NOT NULL AND distance_km < 50 THEN 0
+            WHEN distance_km IS NOT NULL THEN 1
+            ELSE 2
+        END,
+        distance_km NULLS LAST,
+        (location_region = COALESCE($6, location_region)) DESC,
+        created_at DESC
+    LIMIT $7;
+"""
+
+
+# One square band of grid cells: inside the $7..$10 box but outside the $11..$14 box.
+def _candidate_ring_query(exclude_swiped: bool) -> str:
+    return f"""
+    WITH pool AS (
+        SELECT
+            u.user_id,
+            u.created_at,
+            (u.location_region = COALESCE($6, u.location_region)) AS region_match,
+            {_CANDIDATE_DISTANCE_SQL} AS distance_km
+        {_candidate_filter_sql(exclude_swiped)}
+          AND u.geo_cell_lat BETWEEN $7 AND $8
+          AND u.geo_cell_lon BETWEEN $9 AND $10
+          AND NOT (u.geo_cell_lat BETWEEN $11 AND $12 AND u.geo_cell_lon BETWEEN $13 AND $14)
+    )
+    SELECT user_id, created_at, region_match, distance_km
+    FROM pool
+    ORDER BY distance_km, region_match DESC, created_at DESC
+    LIMIT $15;
+"""
+
+
+_CANDIDATE_SCAN_QUERIES = {exclude: _candidate_scan_query(exclude) for exclude in (True, False)}
+_CANDIDATE_RING_QUERIES = {exclude: _candidate_ring_query(exclude) for exclude in (True, False)}
+
+# Profile columns returned for both sides of a swipe; enough to render like/match notifications.
+SWIPE_PROFILE_COLUMNS = (
+    "user_id",
+    "full_name",
+    "language",
+    "age",
+    "gender",
+    "location_region",
+    "township",
+    "bio",
+    "photo_id",
+    "latitude",
+    "longitude",
+)
+
+# Upserts actor -> target and returns the previous action, the reciprocal like and both
+# profiles in one round trip. No row comes back when the target no longer exists.
+_RECORD_SWIPE_QUERY = f"""
+    WITH target AS (
+        SELECT {", ".join(SWIPE_PROFILE_COLUMNS)}
+        FROM users
+        WHERE user_id = $2
+    ),
+    actor AS (
+        SELECT {", ".join(SWIPE_PROFILE_COLUMNS)}
+        FROM users
+        WHERE user_id = $1
+    ),
+    previous AS (
+        SELECT action_type
+        FROM actions
+        WHERE actor_id = $1
+          AND target_id = $2
+    ),
+    saved AS (
+        INSERT INTO actions (actor_id, target_id, action_type)
+        SELECT actor.user_id, target.user_id, CAST($3 AS varchar)
+        FROM target, actor
+        ON CONFLICT (actor_id, target_id) DO UPDATE
+        SET action_type = EXCLUDED.action_type,
+            created_at = CURRENT_TIMESTAMP
+        RETURNING actor_id
+    )
+    SELECT
+        (SELECT action_type FROM previous) AS previous_action,
+        EXISTS (
+            SELECT 1
+            FROM actions
+            WHERE actor_id = $2
+              AND target_id = $1
+              AND action_type IN ('like', 'superlike')
+        ) AS target_liked_actor,
+        {", ".join(f"t.{column} AS target_{column}" for column in SWIPE_PROFILE_COLUMNS)},
+        {", ".join(f"a.{column} AS actor_{column}" for column in SWIPE_PROFILE_COLUMNS)}
+    FROM target t
+    LEFT JOIN actor a ON TRUE;
+"""
+
 
 @dataclass(slots=True)
 class UserRepository:
     db: Database
+    cache: ProfileCache | None = None
+    listeners: list[UserChangeListener] = field(default_factory=list)
+
+    # Per-update identity map: rows read or written while a scope is open are served from
+    # memory, and mutators refresh them from RETURNING * instead of a follow-up SELECT.
+    @staticmethod
+    def open_scope() -> Token[dict[int, Row | None] | None]:
+        return _user_scope.set({})
+
+    @staticmethod
+    def close_scope(token: Token[dict[int, Row | None] | None]) -> None:
+        _user_scope.reset(token)
+
+    @staticmethod
+    def _remember(user_id: int, row: Row | None) -> None:
+        scope = _user_scope.get()
+        if scope is not None:
+            scope[user_id] = row
+
+    async def _written(self, user_id: int, row: Row | None, notify: bool = False) -> None:
+        # Every mutator ends here with its RETURNING * row, so the cache never serves a
+        # profile older than the last write made through this repository.
+        self._remember(user_id, row)
+        if self.cache is not None:
+            if row is None:
+                await self.cache.evict(user_id)
+            else:
+                await self.cache.put(row)
+        if notify:
+            for listener in self.listeners:
+                await listener(user_id, row)
 
     async def ensure_user(self, user_id: int, full_name: str, username: str | None) -> asyncpg.Record:
         query = """
@@ -23,13 +223,59 @@ class UserRepository:
                 updated_at = CURRENT_TIMESTAMP
             RETURNING *;
         """
-        return await self.db.fetchrow(query, user_id, full_name, username)  # type: ignore[return-value]
+        row = await self.db.fetchrow(query, user_id, full_name, username)
+        await self._written(user_id, row)
+        return row  # type: ignore[return-value]
 
     async def get(self, user_id: int) -> asyncpg.Record | None:
+        scope = _user_scope.get()
+        if scope is not None and user_id in scope:
+            return scope[user_id]  # type: ignore[return-value]
+        row = await self.cache.get(user_id) if self.cache is not None else None
+        if row is None:
+            row = await self.db.fetchrow("SELECT * FROM users WHERE user_id = $1;", user_id)
+            if row is not None and self.cache is not None:
+                await self.cache.fill(row)
+        if scope is not None:
+            scope[user_id] = row
+        return row  # type: ignore[return-value]
+
+    async def get_uncached(self, user_id: int) -> asyncpg.Record | None:
+        # Straight from Postgres, for readers that must not see a profile cached before a write
+        # made by another process.
         return await self.db.fetchrow("SELECT * FROM users WHERE user_id = $1;", user_id)
 
+    async def get_many(self, user_ids: list[int]) -> dict[int, Row]:
+        # Same tiers as get(): update scope, profile cache, then one ANY($1) query for the rest.
+        scope = _user_scope.get()
+        found: dict[int, Row] = {}
+        pending: list[int] = []
+        for user_id in dict.fromkeys(user_ids):
+            if scope is not None and user_id in scope:
+                row = scope[user_id]
+                if row is not None:
+                    found[user_id] = row
+            else:
+                pending.append(user_id)
+        if pending and self.cache is not None:
+            found.update(await self.cache.get_many(pending))  # type: ignore[arg-type]
+        missing = [user_id for user_id in pending if user_id not in found]
+        if missing:
+            rows = await self.db.fetch("SELECT * FROM users WHERE user_id = ANY($1::bigint[]);", missing)
+            for row in rows:
+                found[int(row["user_id"])] = row
+            if self.cache is not None:
+                await self.cache.fill_many(rows)
+        if scope is not None:
+            for user_id in pending:
+                scope[user_id] = found.get(user_id)
+        return found
+
     async def get_language(self, user_id: int, default: str = "en") -> str:
-        row = await self.db.fetchrow("SELECT language FROM users WHERE user_id = $1;", user_id)
+        if _user_scope.get() is not None or self.cache is not None:
+            row = await self.get(user_id)
+        else:
+            row = await self.db.fetchrow("SELECT language FROM users WHERE user_id = $1;", user_id)
         if not row:
             return default
         language = row["language"] or default
@@ -73,9 +319,10 @@ class UserRepository:
                 photo_id = EXCLUDED.photo_id,
                 latitude = EXCLUDED.latitude,
                 longitude = EXCLUDED.longitude,
-                updated_at = CURRENT_TIMESTAMP;
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING *;
         """
-        await self.db.execute(
+        row = await self.db.fetchrow(
             query,
             user_id,
             full_name,
@@ -91,6 +338,7 @@ class UserRepository:
             latitude,
             longitude,
         )
+        await self._written(user_id, row, notify=True)
 
     async def delete_account(self, user_id: int) -> bool:
         row = await self.db.fetchrow(
@@ -101,74 +349,85 @@ class UserRepository:
             """,
             user_id,
         )
+        await self._written(user_id, None, notify=True)
         return row is not None
 
     async def set_language(self, user_id: int, language: str) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET language = $2, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             language,
         )
+        await self._written(user_id, row)
 
     async def update_coordinates(self, user_id: int, latitude: float, longitude: float) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET latitude = $2,
                 longitude = $3,
                 updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             latitude,
             longitude,
         )
+        await self._written(user_id, row, notify=True)
 
     async def update_photo(self, user_id: int, photo_id: str) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET photo_id = $2,
                 updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             photo_id,
         )
+        await self._written(user_id, row, notify=True)
 
     async def update_bio(self, user_id: int, bio: str) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET bio = LEFT($2, 500),
                 updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             bio,
         )
+        await self._written(user_id, row)
 
     async def set_premium_until(self, user_id: int, premium_until: datetime | None) -> None:
         is_premium = premium_until is not None and premium_until > now_utc()
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET is_premium = $2,
                 premium_until = $3,
                 updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             is_premium,
             premium_until,
         )
+        await self._written(user_id, row)
 
     async def refresh_like_window(self, user_id: int) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET likes_today = CASE
@@ -182,32 +441,38 @@ class UserRepository:
                     ELSE likes_reset_at
                 END,
                 updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
         )
+        await self._written(user_id, row)
 
     async def set_like_cache(self, user_id: int, likes_today: int) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET likes_today = $2, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             likes_today,
         )
+        await self._written(user_id, row)
 
     async def set_banned(self, user_id: int, is_banned: bool) -> None:
-        await self.db.execute(
+        row = await self.db.fetchrow(
             """
             UPDATE users
             SET is_banned = $2, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1;
+            WHERE user_id = $1
+            RETURNING *;
             """,
             user_id,
             is_banned,
         )
+        await self._written(user_id, row, notify=True)
 
     async def list_candidate_ids(
         self,
@@ -218,67 +483,151 @@ class UserRepository:
         viewer_longitude: float | None,
         viewer_region: str | None,
         limit: int = 80,
+        screen: CandidateScreen | None = None,
+        overfetch: int = 4,
     ) -> list[int]:
-        query = """
-            WITH pool AS (
-                SELECT
-                    u.user_id,
-                    u.location_region,
-                    u.created_at,
-                    CASE
-                        WHEN CAST($4 AS double precision) IS NULL
-                             OR CAST($5 AS double precision) IS NULL
-                             OR u.latitude IS NULL
-                             OR u.longitude IS NULL
-                            THEN NULL
-                        ELSE 6371 * acos(
-                            LEAST(1.0, GREATEST(-1.0,
-                                cos(radians(CAST($4 AS double precision))) * cos(radians(u.latitude))
-                                * cos(radians(u.longitude) - radians(CAST($5 AS double precision)))
-                                + sin(radians(CAST($4 AS double precision))) * sin(radians(u.latitude))
-                            ))
-                        )
-                    END AS distance_km
-                FROM users u
-                LEFT JOIN actions a
-                    ON a.actor_id = $1 AND a.target_id = u.user_id
-                WHERE u.user_id != $1
-                  AND u.is_banned = FALSE
-                  AND (
-                      (CAST($2 AS text) = 'both' AND u.gender IN ('male', 'female'))
-                      OR (CAST($2 AS text) IN ('male', 'female') AND u.gender = CAST($2 AS text))
-                  )
-                  AND (u.seeking = 'both' OR u.seeking = $3)
-                  AND u.photo_id IS NOT NULL
-                  AND u.age IS NOT NULL
-                  AND u.location_region IS NOT NULL
-                  AND u.township IS NOT NULL
-                  AND a.target_id IS NULL
+        # With a screen the actions anti-join is dropped: pages are over-fetched and the screen
+        # removes swiped users. Whenever a screened page cannot be trusted to hold the nearest
+        # `limit` unswiped users, the exact anti-join query runs instead.
+        args = (viewer_id, seeking, viewer_gender, viewer_latitude, viewer_longitude, viewer_region)
+        if screen is not None:
+            candidate_ids = await self._list_screened_candidate_ids(
+                args,
+                viewer_latitude,
+                viewer_longitude,
+                limit,
+                screen,
+                max(1, overfetch),
             )
-            SELECT user_id
-            FROM pool
-            ORDER BY
-                CASE
-                    WHEN distance_km IS NOT NULL AND distance_km < 50 THEN 0
-                    WHEN distance_km IS NOT NULL THEN 1
-                    ELSE 2
-                END,
-                distance_km NULLS LAST,
-                (location_region = COALESCE($6, location_region)) DESC,
-                created_at DESC
-            LIMIT $7;
-        """
+            if candidate_ids is not None:
+                return candidate_ids
+
+        if viewer_latitude is not None and viewer_longitude is not None:
+            candidate_ids = await self._walk_candidate_rings(args, float(viewer_latitude), float(viewer_longitude), limit)
+            if candidate_ids is not None:
+                return candidate_ids
+
+        rows = await self.db.fetch(_CANDIDATE_SCAN_QUERIES[True], *args, limit)
+        return [int(item["user_id"]) for item in rows]
+
+    async def _list_screened_candidate_ids(
+        self,
+        args: tuple[object, ...],
+        latitude: float | None,
+        longitude: float | None,
+        limit: int,
+        screen: CandidateScreen,
+        overfetch: int,
+    ) -> list[int] | None:
+        if latitude is not None and longitude is not None:
+            candidate_ids = await self._walk_candidate_rings(
+                args,
+                float(latitude),
+                float(longitude),
+                limit,
+                screen=screen,
+                overfetch=overfetch,
+            )
+            if candidate_ids is not None:
+                return candidate_ids
+
+        page_size = limit * overfetch
+        rows = await self.db.fetch(_CANDIDATE_SCAN_QUERIES[False], *args, page_size)
+        candidate_ids = await screen([int(item["user_id"]) for item in rows])
+        if candidate_ids is None or (len(rows) >= page_size and len(candidate_ids) < limit):
+            return None
+        return candidate_ids[:limit]
+
+    async def _walk_candidate_rings(
+        self,
+        args: tuple[object, ...],
+        latitude: float,
+        longitude: float,
+        limit: int,
+        screen: CandidateScreen | None = None,
+        overfetch: int = 1,
+    ) -> list[int] | None:
+        # Walk outward from the viewer's grid cell one square band at a time. A candidate is final
+        # once it is closer than the nearest unvisited cell, so dense areas stop after one band.
+        cell_lat = floor(latitude * GEO_CELLS_PER_DEGREE)
+        cell_lon = floor(longitude * GEO_CELLS_PER_DEGREE)
+        page_size = limit * overfetch
+        pool: list[tuple[float, bool, float, int]] = []
+        inner = -1
+        for radius in _GEO_RING_RADII:
+            rows = await self.db.fetch(
+                _CANDIDATE_RING_QUERIES[screen is None],
+                *args,
+                cell_lat - radius,
+                cell_lat + radius,
+                cell_lon - radius,
+                cell_lon + radius,
+                cell_lat - inner,
+                cell_lat + inner,
+                cell_lon - inner,
+                cell_lon + inner,
+                page_size,
+            )
+            inner = radius
+            kept: set[int] | None = None
+            if screen is not None:
+                screened = await screen([int(item["user_id"]) for item in rows])
+                if screened is None:
+                    return None
+                kept = set(screened)
+            for item in rows:
+                user_id = int(item["user_id"])
+                if kept is not None and user_id not in kept:
+                    continue
+                created_at = item["created_at"]
+                pool.append(
+                    (
+                        float(item["distance_km"]),
+                        not item["region_match"],
+                        -created_at.timestamp() if created_at is not None else float("-inf"),
+                        user_id,
+                    )
+                )
+            pool.sort()
+
+            edge_latitude = min(89.9, abs(latitude) + (radius + 1) / GEO_CELLS_PER_DEGREE)
+            covered_km = radius / GEO_CELLS_PER_DEGREE * _KM_PER_DEGREE * cos(radians(edge_latitude))
+            # A full screened page may have left unswiped users of this band unfetched; they are
+            # no closer than its last row, and the next band's query would never see them.
+            truncated = screen is not None and len(rows) >= page_size
+            if truncated:
+                covered_km = min(covered_km, float(rows[-1]["distance_km"]))
+            settled = 0
+            while settled < len(pool) and pool[settled][0] <= covered_km:
+                settled += 1
+            if settled >= limit:
+                return [item[3] for item in pool[:limit]]
+            if truncated:
+                return None
+        # Sparse area: not enough candidates nearby, fall back to the full ordered scan.
+        return None
+
+    async def list_discoverable(self, after_user_id: int, limit: int = 1000) -> list[Row]:
+        # Keyset pages over everyone who can appear as a candidate, for rebuilding derived
+        # discovery state (segment pools) from Postgres.
         rows = await self.db.fetch(
-            query,
-            viewer_id,
-            seeking,
-            viewer_gender,
-            viewer_latitude,
-            viewer_longitude,
-            viewer_region,
+            """
+            SELECT *
+            FROM users u
+            WHERE u.user_id > $1
+              AND u.is_banned = FALSE
+              AND u.gender IN ('male', 'female')
+              AND u.photo_id IS NOT NULL
+              AND u.age IS NOT NULL
+              AND u.location_region IS NOT NULL
+              AND u.township IS NOT NULL
+            ORDER BY u.user_id
+            LIMIT $2;
+            """,
+            after_user_id,
             limit,
         )
-        return [int(item["user_id"]) for item in rows]
+        return list(rows)
 
     async def list_boost_viewer_ids(
         self,
@@ -302,6 +651,8 @@ class UserRepository:
               AND (u.seeking = 'both' OR u.seeking = $3)
               AND u.photo_id IS NOT NULL
               AND u.age IS NOT NULL
+              AND u.location_region IS NOT NULL
+              AND u.township IS NOT NULL
               AND a.target_id IS NULL
               AND (CAST($4 AS text) IS NULL OR u.location_region = $4)
             ORDER BY u.created_at DESC
@@ -311,10 +662,34 @@ class UserRepository:
         return [int(item["user_id"]) for item in rows]
 
 
+@dataclass(slots=True)
+class SwipeResult:
+    previous_action: str | None
+    target_liked_actor: bool
+    target: dict[str, object]
+    actor: dict[str, object] | None
+
+
 @dataclass(slots=True)
 class ActionRepository:
     db: Database
 
+    async def record_swipe(self, actor_id: int, target_id: int, action_type: str) -> SwipeResult | None:
+        row = await self.db.fetchrow(_RECORD_SWIPE_QUERY, actor_id, target_id, action_type)
+        if row is None:
+            return None
+        target = {column: row[f"target_{column}"] for column in SWIPE_PROFILE_COLUMNS}
+        actor = None
+        if row["actor_user_id"] is not None:
+            actor = {column: row[f"actor_{column}"] for column in SWIPE_PROFILE_COLUMNS}
+        previous_action = row["previous_action"]
+        return SwipeResult(
+            previous_action=str(previous_action) if previous_action is not None else None,
+            target_liked_actor=bool(row["target_liked_actor"]),
+            target=target,
+            actor=actor,
+        )
+
     async def get_action_type(self, actor_id: int, target_id: int) -> str | None:
         row = await self.db.fetchrow(
             """
@@ -353,6 +728,49 @@ class ActionRepository:
             target_id,
         )
 
+    async def count_up_to(self, actor_id: int, cap: int) -> int:
+        # Stops counting at `cap`, so heavy swipers cost no more than the threshold check.
+        row = await self.db.fetchrow(
+            """
+            SELECT COUNT(*)::int AS total
+            FROM (
+                SELECT 1
+                FROM actions
+                WHERE actor_id = $1
+                LIMIT $2
+            ) AS capped;
+            """,
+            actor_id,
+            cap,
+        )
+        return int(row["total"]) if row else 0
+
+    async def list_target_ids(self, actor_id: int) -> list[int]:
+        rows = await self.db.fetch(
+            """
+            SELECT target_id
+            FROM actions
+            WHERE actor_id = $1;
+            """,
+            actor_id,
+        )
+        return [int(item["target_id"]) for item in rows]
+
+    async def swiped_among(self, actor_id: int, target_ids: list[int]) -> set[int]:
+        if not target_ids:
+            return set()
+        rows = await self.db.fetch(
+            """
+            SELECT target_id
+            FROM actions
+            WHERE actor_id = $1
+              AND target_id = ANY($2::bigint[]);
+            """,
+            actor_id,
+            target_ids,
+        )
+        return {int(item["target_id"]) for item in rows}
+
     async def has_positive_action(self, actor_id: int, target_id: int) -> bool:
         query = """
             SELECT EXISTS (
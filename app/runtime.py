@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
+
+from app.config import Settings
+from app.context import AppContext, set_app
+from app.db import Database
+from app.handlers import get_routers
+from app.metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware, bind_runtime
+from app.middlewares import SlowUpdateMiddleware, ThrottlingMiddleware, UpdateDedupeMiddleware, ViewerMiddleware
+from app.migrations import migrate
+from app.outbound import OutboundDispatcher
+from app.profile_cache import ProfileCache
+from app.repositories import ActionRepository, PremiumRequestRepository, ReportRepository, UserRepository
+from app.services import DiscoveryService
+
+
+@dataclass(slots=True)
+class RuntimeResources:
+    settings: Settings
+    db: Database
+    redis: Redis
+    bot: Bot
+    dp: Dispatcher
+    discovery: DiscoveryService
+    outbound: OutboundDispatcher
+    profile_cache: ProfileCache | None
+
+
+async def build_runtime(settings: Settings) -> RuntimeResources:
+    db = Database(settings.database_url, backend=settings.database_backend)
+    await db.connect()
+    await migrate(db)
+    bind_runtime(db=db)
+
+    redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
+    storage = RedisStorage.from_url(settings.redis_url)
+    session = None
+    if settings.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+    bot = Bot(
+        token=settings.bot_token,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    bot.session.middleware(TelegramMetricsMiddleware())
+    dp = Dispatcher(storage=storage)
+    if settings.slow_update_ms > 0:
+        dp.update.outer_middleware(
+            SlowUpdateMiddleware(
+                threshold_ms=settings.slow_update_ms,
+                profile_every=settings.profile_every,
+                profile_dir=settings.profile_dir,
+            )
+        )
+    dp.update.outer_middleware(UpdateDedupeMiddleware(redis_client))
+    throttle = ThrottlingMiddleware(redis_client)
+    dp.message.outer_middleware(throttle)
+    dp.callback_query.outer_middleware(throttle)
+
+    profile_cache = None
+    if settings.profile_cache_ttl_seconds > 0:
+        profile_cache = ProfileCache(
+            redis_client,
+            ttl_seconds=settings.profile_cache_ttl_seconds,
+            local_ttl_seconds=settings.profile_cache_local_ttl_seconds,
+            local_max_entries=settings.profile_cache_local_size,
+        )
+    users = UserRepository(db, cache=profile_cache)
+    viewer_loader = ViewerMiddleware(users)
+    dp.message.outer_middleware(viewer_loader)
+    dp.callback_query.outer_middleware(viewer_loader)
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+    actions = ActionRepository(db)
+    premium_requests = PremiumRequestRepository(db)
+    reports = ReportRepository(db)
+    discovery = DiscoveryService(
+        users,
+        redis_client,
+        refill_watermark=settings.discovery_refill_watermark,
+        refill_workers=settings.discovery_refill_workers,
+        prefetch_cards=settings.discovery_prefetch_cards,
+        actions=actions,
+        seen_filter_min_actions=settings.discovery_seen_filter_min_actions,
+        segment_pools=settings.discovery_segment_pools,
+        engine=settings.discovery_engine,
+    )
+    outbound = OutboundDispatcher(bot, redis_client, rate_per_second=settings.outbound_rate_per_second)
+
+    context = AppContext(
+        settings=settings,
+        db=db,
+        redis=redis_client,
+        users=users,
+        actions=actions,
+        premium_requests=premium_requests,
+        reports=reports,
+        discovery=discovery,
+        outbound=outbound,
+    )
+    set_app(context)
+
+    for router in get_routers(settings.premium_enabled):
+        dp.include_router(router)
+
+    return RuntimeResources(
+        settings=settings,
+        db=db,
+        redis=redis_client,
+        bot=bot,
+        dp=dp,
+        discovery=discovery,
+        outbound=outbound,
+        profile_cache=profile_cache,
+    )
+
+
+async def start_runtime(runtime: RuntimeResources) -> None:
+    await runtime.discovery.start()
+    await runtime.outbound.start()
+    if runtime.profile_cache is not None:
+        await runtime.profile_cache.start()
+
+
+async def close_runtime(runtime: RuntimeResources) -> None:
+    await runtime.discovery.close()
+    await runtime.outbound.close()
+    if runtime.profile_cache is not None:
+        await runtime.profile_cache.close()
+    await runtime.dp.storage.close()
+    await runtime.bot.session.close()
+    await runtime.redis.aclose()
+    await runtime.db.close()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from hashlib import blake2b
+
+from redis.asyncio import Redis
+
+from app.metrics import observe_redis
+
+_HASHES = 4
+# Sized for ~0.2% false positives at build time; it is rebuilt bigger once the count of
+# added ids halves the bits per id (~2.5% false positives).
+_BITS_PER_ID = 16
+_MIN_BITS = 1 << 16
+_MAX_BITS = 1 << 23
+_SATURATED_BITS_PER_ID = _BITS_PER_ID // 2
+
+# Bit j of an id is (h1 + j * h2) mod the bitmap size, taken from STRLEN so a rebuild can grow
+# the bitmap without coordinating with writers. ARGV: ttl, then h1/h2 pairs.
+_ADD_SCRIPT = """
+local size = redis.call('STRLEN', KEYS[1]) * 8
+if size == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    local h1 = tonumber(ARGV[i])
+    local h2 = tonumber(ARGV[i + 1])
+    local args = {}
+    for j = 0, %(hashes)d - 1 do
+        table.insert(args, 'SET')
+        table.insert(args, 'u1')
+        table.insert(args, (h1 + j * h2) %% size)
+        table.insert(args, 1)
+    end
+    redis.call('BITFIELD', KEYS[1], unpack(args))
+end
+redis.call('INCRBY', KEYS[2], (#ARGV - 1) / 2)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]))
+return 1
+""" % {"hashes": _HASHES}
+
+# Returns false when there is no filter, otherwise one flag per h1/h2 pair (1 = maybe seen).
+_CHECK_SCRIPT = """
+local size = redis.call('STRLEN', KEYS[1]) * 8
+if size == 0 then
+    return false
+end
+local flags = {}
+for i = 1, #ARGV, 2 do
+    local h1 = tonumber(ARGV[i])
+    local h2 = tonumber(ARGV[i + 1])
+    local args = {}
+    for j = 0, %(hashes)d - 1 do
+        table.insert(args, 'GET')
+        table.insert(args, 'u1')
+        table.insert(args, (h1 + j * h2) %% size)
+    end
+    local bits = redis.call('BITFIELD', KEYS[1], unpack(args))
+    local hit = 1
+    for _, bit in ipairs(bits) do
+        if bit == 0 then
+            hit = 0
+            break
+        end
+    end
+    table.insert(flags, hit)
+end
+return flags
+""" % {"hashes": _HASHES}
+
+
+def _hash_pair(user_id: int) -> tuple[int, int]:
+    digest = int.from_bytes(blake2b(str(user_id).encode(), digest_size=8).digest(), "little")
+    # An odd step keeps the probes distinct on a power-of-two bitmap.
+    return digest & 0xFFFFFFFF, (digest >> 32) | 1
+
+
+def _hash_args(user_ids: list[int]) -> list[int]:
+    args: list[int] = []
+    for user_id in user_ids:
+        args.extend(_hash_pair(user_id))
+    return args
+
+
+@dataclass(frozen=True, slots=True)
+class SeenFilterStatus:
+    exists: bool
+    skipped: bool
+    saturated: bool
+
+
+class SeenFilter:
+    # Per-viewer bloom filter over the ids the viewer has swiped, kept in a plain Redis bitmap so
+    # no Redis module is needed. It has no false negatives for swipes added through add(), but
+    # ids cannot be removed: a rewind drops the whole filter and the next refill rebuilds it.
+    def __init__(self, redis_client: Redis, ttl_seconds: int) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self._add_script = redis_client.register_script(_ADD_SCRIPT)
+        self._check_script = redis_client.register_script(_CHECK_SCRIPT)
+
+    @staticmethod
+    def _bits_key(viewer_id: int) -> str:
+        return f"discover_seen_filter:{viewer_id}"
+
+    @staticmethod
+    def _count_key(viewer_id: int) -> str:
+        return f"discover_seen_filter_count:{viewer_id}"
+
+    @staticmethod
+    def _skip_key(viewer_id: int) -> str:
+        return f"discover_seen_filter_skip:{viewer_id}"
+
+    async def add(self, viewer_id: int, target_id: int, client: Redis | None = None) -> None:
+        # Only updates an existing filter; pass a pipeline as `client` to batch it with other writes.
+        await self._add_script(
+            keys=[self._bits_key(viewer_id), self._count_key(viewer_id)],
+            args=[self.ttl_seconds, *_hash_pair(target_id)],
+            client=client,
+        )
+
+    @observe_redis("seen_filter_status")
+    async def status(self, viewer_id: int) -> SeenFilterStatus:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.strlen(self._bits_key(viewer_id))
+            pipe.get(self._count_key(viewer_id))
+            pipe.exists(self._skip_key(viewer_id))
+            size, count, skipped = await pipe.execute()
+        bits = int(size) * 8
+        saturated = bits > 0 and bits < _MAX_BITS and int(count or 0) * _SATURATED_BITS_PER_ID > bits
+        return SeenFilterStatus(exists=bits > 0, skipped=bool(skipped), saturated=saturated)
+
+    @observe_redis("seen_filter_check")
+    async def check(self, viewer_id: int, candidate_ids: list[int]) -> list[bool] | None:
+        if not candidate_ids:
+            return []
+        flags = await self._check_script(keys=[self._bits_key(viewer_id)], args=_hash_args(candidate_ids))
+        if flags is None:
+            return None
+        return [bool(flag) for flag in flags]
+
+    @observe_redis("seen_filter_build")
+    async def build(self, viewer_id: int, target_ids: list[int]) -> None:
+        bits = _MIN_BITS
+        while bits < len(target_ids) * _BITS_PER_ID and bits < _MAX_BITS:
+            bits <<= 1
+        bitmap = bytearray(bits // 8)
+        for target_id in target_ids:
+            h1, h2 = _hash_pair(target_id)
+            for j in range(_HASHES):
+                offset = (h1 + j * h2) % bits
+                # Redis numbers bitmap bits from the most significant bit of each byte.
+                bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._bits_key(viewer_id), bytes(bitmap), ex=self.ttl_seconds)
+            pipe.set(self._count_key(viewer_id), len(target_ids), ex=self.ttl_seconds)
+            pipe.delete(self._skip_key(viewer_id))
+            await pipe.execute()
+
+    @observe_redis("seen_filter_skip")
+    async def skip(self, viewer_id: int, ttl_seconds: int) -> None:
+        # Remembers that the viewer has too few swipes for a filter to pay off.
+        await self.redis.set(self._skip_key(viewer_id), "1", ex=ttl_seconds)
+
+    @observe_redis("seen_filter_drop")
+    async def drop(self, viewer_id: int) -> None:
+        await self.redis.delete(self._bits_key(viewer_id), self._count_key(viewer_id))
@@ -1,54 +1,533 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
+import logging
+import uuid
+from collections import deque
+from collections.abc import Awaitable, Mapping
+from dataclasses import dataclass
+from datetime import UTC
+from time import monotonic
+from typing import Any
+
 import asyncpg
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.candidate_engine import MemoryCandidateEngine
+from app.db import Row
+from app.metrics import SEEN_FILTER_EVENTS, observe_redis
+from app.profile_cache import PROFILE_KEY_PREFIX
+from app.repositories import ActionRepository, CandidateScreen, UserRepository
+from app.seen_filter import SeenFilter
+from app.utils import now_utc
+
+logger = logging.getLogger(__name__)
+
+# Queues and candidate -> viewers membership sets expire when they stop receiving pushes.
+_QUEUE_TTL_SECONDS = 7 * 24 * 60 * 60
+_SEEN_TTL_SECONDS = 30 * 24 * 60 * 60
+_REFILL_LOCK_SECONDS = 30
+_REFILL_BACKLOG = 1000
+_BLOCKED_KEY = "discover_blocked"
+# Queues created before membership sets existed get theirs once, from a SCAN; the marker
+# outlives every such queue.
+_MEMBERS_BACKFILLED_KEY = "discover_members_backfilled"
+_MEMBERS_BACKFILL_LOCK_KEY = "discover_members_backfill_lock"
+_MEMBERS_BACKFILL_LOCK_SECONDS = 10 * 60
+# Refills of viewers with a seen filter over-fetch this many rows per candidate they need.
+_SEEN_FILTER_OVERFETCH = 4
+_SEEN_FILTER_SKIP_SECONDS = 24 * 60 * 60
+
+# Deletes a lock only while it still holds the caller's token: a refill that outlived
+# _REFILL_LOCK_SECONDS must not release the lock another worker has taken since.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Pops until a candidate the viewer has not swiped (KEYS[2]) and that is not banned or
+# deleted (KEYS[3]). Returns {candidate or "", skipped, remaining queue length, profile hash}.
+# The profile hash key (ARGV[2] .. candidate, empty prefix = no profile cache) is only known
+# after the pop, so it is built in the script; fine on a single Redis, not on Cluster.
+_POP_CANDIDATE_SCRIPT = """
+local skipped = 0
+local max_skips = tonumber(ARGV[1])
+while true do
+    local candidate = redis.call('LPOP', KEYS[1])
+    if not candidate then
+        return {'', skipped, 0, {}}
+    end
+    if redis.call('SISMEMBER', KEYS[2], candidate) == 0
+        and redis.call('SISMEMBER', KEYS[3], candidate) == 0 then
+        local profile = {}
+        if ARGV[2] ~= '' then
+            profile = redis.call('HGETALL', ARGV[2] .. candidate)
+        end
+        return {candidate, skipped, redis.call('LLEN', KEYS[1]), profile}
+    end
+    skipped = skipped + 1
+    if skipped >= max_skips then
+        return {'', skipped, redis.call('LLEN', KEYS[1]), {}}
+    end
+end
+"""
+_POP_MAX_SKIPS = 200
+
+_POOL_KEY_PREFIX = "discover_pool:"
+_POOL_SEGMENTS_KEY = "discover_pool_segments"
+_POOL_MEMBERS_KEY = "discover_pool_members"
+_POOL_READY_KEY = "discover_pool_ready"
+_POOL_BACKFILL_LOCK_KEY = "discover_pool_backfill_lock"
+_POOL_BACKFILL_LOCK_SECONDS = 10 * 60
+_POOL_BACKFILL_BATCH = 1000
+# The ready marker outlives a few maintenance passes, so it only disappears when Redis lost
+# it (flush, failover) or no replica has been running; either way the pools are rebuilt.
+_POOL_READY_SECONDS = 10 * 60
+_POOL_MAINTAIN_SECONDS = 60
+_POOL_READY_CHECK_SECONDS = 5.0
+# A non-discoverable user keeps a short-lived tombstone instead of a members hash entry; it
+# only has to outlast a backfill that read the user before the change.
+_POOL_TOMBSTONE_SECONDS = _POOL_BACKFILL_LOCK_SECONDS
+# Segments are read newest first in ZREVRANGE windows; a refill that has to look past this
+# many pool members (heavy swipers) goes to Postgres instead.
+_POOL_WINDOW = 200
+_POOL_SCAN_BUDGET = 4000
+# Refills that skip the actions anti-join retry this many times after the exact check.
+_VERIFY_ROUNDS = 3
+
+# Moves a user between segment pools. KEYS: member -> "updated_at|segment" hash, segment
+# registry, the user's tombstone; ARGV: user_id, updated_at, segment key ('' = not
+# discoverable), score, tombstone ttl. A write older than the recorded one is ignored, so a
+# backfill page read before a ban cannot undo it.
+_POOL_MOVE_SCRIPT = """
+local recorded = redis.call('GET', KEYS[3])
+local previous = ''
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current then
+    local separator = string.find(current, '|', 1, true)
+    recorded = string.sub(current, 1, separator - 1)
+    previous = string.sub(current, separator + 1)
+end
+if recorded and recorded > ARGV[2] then
+    return 0
+end
+if previous ~= '' and previous ~= ARGV[3] then
+    redis.call('ZREM', previous, ARGV[1])
+end
+if ARGV[3] == '' then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('SET', KEYS[3], ARGV[2], 'EX', tonumber(ARGV[5]))
+    return 1
+end
+redis.call('ZADD', ARGV[3], ARGV[4], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[3])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. '|' .. ARGV[3])
+redis.call('DEL', KEYS[3])
+return 1
+"""
+
+
+class _SegmentMerge:
+    # Newest-first k-way merge over segment sorted sets, read one window per segment at a time.
+    def __init__(self, redis_client: Redis, segments: list[str]) -> None:
+        self.redis = redis_client
+        self.segments = segments
+        self._offsets = [0] * len(segments)
+        self._exhausted = [False] * len(segments)
+        self._buffers: list[deque[tuple[str, float]]] = [deque() for _ in segments]
+        self._heads: list[tuple[float, str, int]] = []
+        self._started = False
+
+    async def take(self, count: int) -> list[int]:
+        if not self._started:
+            self._started = True
+            await self._read(list(range(len(self.segments))))
+            for index in range(len(self.segments)):
+                self._advance(index)
+        taken: list[int] = []
+        while len(taken) < count and self._heads:
+            _, member, index = heapq.heappop(self._heads)
+            taken.append(int(member))
+            if not self._buffers[index] and not self._exhausted[index]:
+                await self._read([index])
+            self._advance(index)
+        return taken
+
+    def _advance(self, index: int) -> None:
+        if self._buffers[index]:
+            member, score = self._buffers[index].popleft()
+            heapq.heappush(self._heads, (-score, member, index))
+
+    @observe_redis("pool_read")
+    async def _read(self, indexes: list[int]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for index in indexes:
+                offset = self._offsets[index]
+                pipe.zrevrange(self.segments[index], offset, offset + _POOL_WINDOW - 1, withscores=True)
+            windows = await pipe.execute()
+        for index, window in zip(indexes, windows):
+            self._offsets[index] += _POOL_WINDOW
+            self._exhausted[index] = len(window) < _POOL_WINDOW
+            self._buffers[index].extend(window)
+
+
+@observe_redis("remember_seen")
+async def _remember_seen(redis_client: Redis, viewer_id: int, target_ids: set[int]) -> None:
+    # Repairs the seen set with swipes an exact check found (older than _SEEN_TTL_SECONDS).
+    seen_key = DiscoveryService._seen_key(viewer_id)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.sadd(seen_key, *[str(target_id) for target_id in target_ids])
+        pipe.expire(seen_key, _SEEN_TTL_SECONDS)
+        await pipe.execute()
+
+
+def _pool_segment(row: Mapping[str, Any] | None) -> str:
+    # Same eligibility as the candidate queries in UserRepository; '' = not discoverable.
+    if (
+        row is None
+        or row["is_banned"]
+        or row["gender"] not in ("male", "female")
+        or row["photo_id"] is None
+        or row["age"] is None
+        or row["location_region"] is None
+        or row["township"] is None
+    ):
+        return ""
+    return f"{_POOL_KEY_PREFIX}{row['gender']}:{row['seeking']}:{row['location_region']}"
+
+
+class SegmentPools:
+    # One Redis sorted set of discoverable users per (gender, seeking, region), scored by
+    # created_at. Viewers sharing a segment share the pools, and a refill pages the compatible
+    # segments newest first, own region before the rest, and screens each window against the
+    # viewer's seen set and actions. That is the SQL order for viewers without coordinates; located viewers
+    # are ranked by distance, which the pools do not know, so they keep using Postgres.
+    def __init__(self, users: UserRepository, actions: ActionRepository, redis_client: Redis) -> None:
+        self.users = users
+        self.actions = actions
+        self.redis = redis_client
+        self._move_script = redis_client.register_script(_POOL_MOVE_SCRIPT)
+        self._ready_checked_at = float("-inf")
+        self._ready = False
+
+    async def on_user_changed(self, user_id: int, row: Row | None) -> None:
+        try:
+            await self._move([(user_id, row)])
+        except RedisError:
+            logger.warning("Segment pool update failed for %s", user_id, exc_info=True)
+
+    async def ready(self) -> bool:
+        if monotonic() - self._ready_checked_at >= _POOL_READY_CHECK_SECONDS:
+            self._ready = bool(await self.redis.exists(_POOL_READY_KEY))
+            self._ready_checked_at = monotonic()
+        return self._ready
 
-from app.repositories import UserRepository
+    async def maintain(self) -> None:
+        # Keeps the ready marker alive while the pools are intact and rebuilds them once it is gone.
+        while True:
+            try:
+                if not await self.redis.expire(_POOL_READY_KEY, _POOL_READY_SECONDS):
+                    self._ready = False
+                    await self.backfill()
+            except RedisError:
+                logger.warning("Segment pool maintenance failed", exc_info=True)
+            except Exception:
+                logger.exception("Segment pool backfill failed; refills keep using Postgres")
+            await asyncio.sleep(_POOL_MAINTAIN_SECONDS)
+
+    async def backfill(self) -> None:
+        # One replica rebuilds the pools from Postgres; they stay unused until it finishes.
+        if not await self.redis.set(_POOL_BACKFILL_LOCK_KEY, "1", nx=True, ex=_POOL_BACKFILL_LOCK_SECONDS):
+            return
+        try:
+            after_user_id = 0
+            total = 0
+            while True:
+                rows = await self.users.list_discoverable(after_user_id, _POOL_BACKFILL_BATCH)
+                if not rows:
+                    break
+                await self._move([(int(row["user_id"]), row) for row in rows])
+                await self.redis.expire(_POOL_BACKFILL_LOCK_KEY, _POOL_BACKFILL_LOCK_SECONDS)
+                after_user_id = int(rows[-1]["user_id"])
+                total += len(rows)
+            await self.redis.set(_POOL_READY_KEY, "1", ex=_POOL_READY_SECONDS)
+            self._ready = True
+            self._ready_checked_at = monotonic()
+            logger.info("Segment pools backfilled with %s users", total)
+        finally:
+            await self.redis.delete(_POOL_BACKFILL_LOCK_KEY)
+
+    async def list_candidate_ids(
+        self,
+        viewer_id: int,
+        viewer_gender: str,
+        seeking: str,
+        viewer_region: str | None,
+        limit: int = 80,
+    ) -> list[int] | None:
+        # None means the pools could not settle the page cheaply; the caller asks Postgres.
+        genders = ("male", "female") if seeking == "both" else (seeking,)
+        own: list[str] = []
+        other: list[str] = []
+        for segment in sorted(await self.redis.smembers(_POOL_SEGMENTS_KEY)):
+            gender, segment_seeking, region = segment.removeprefix(_POOL_KEY_PREFIX).split(":", 2)
+            if gender not in genders or segment_seeking not in ("both", viewer_gender):
+                continue
+            # Without a region every candidate counts as a region match, as in the SQL.
+            (own if viewer_region is None or region == viewer_region else other).append(segment)
+        if not own and not other:
+            return []
+
+        candidate_ids: list[int] = []
+        scanned = 0
+        for tier in (own, other):
+            merge = _SegmentMerge(self.redis, tier)
+            while len(candidate_ids) < limit:
+                if scanned >= _POOL_SCAN_BUDGET:
+                    return None
+                batch = await merge.take(2 * (limit - len(candidate_ids)))
+                if not batch:
+                    break
+                scanned += len(batch)
+                candidate_ids.extend(await self._screen(viewer_id, batch))
+        return candidate_ids[:limit]
+
+    async def _screen(self, viewer_id: int, batch: list[int]) -> list[int]:
+        # The seen set only covers swipes of the last _SEEN_TTL_SECONDS, so whatever it lets
+        # through is checked against actions, and the misses are added to it.
+        members = [str(candidate_id) for candidate_id in batch]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.smismember(DiscoveryService._seen_key(viewer_id), members)
+            pipe.smismember(_BLOCKED_KEY, members)
+            seen, blocked = await pipe.execute()
+        fresh = [
+            candidate_id
+            for candidate_id, was_seen, is_blocked in zip(batch, seen, blocked)
+            if not was_seen and not is_blocked and candidate_id != viewer_id
+        ]
+        swiped = await self.actions.swiped_among(viewer_id, fresh)
+        if swiped:
+            await _remember_seen(self.redis, viewer_id, swiped)
+        return [candidate_id for candidate_id in fresh if candidate_id not in swiped]
+
+    @observe_redis("pool_move")
+    async def _move(self, changes: list[tuple[int, Row | None]]) -> None:
+        deleted_at = now_utc().isoformat(timespec="microseconds")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, row in changes:
+                segment = _pool_segment(row)
+                updated_at = row["updated_at"] if row is not None else None
+                created_at = row["created_at"] if row is not None else None
+                await self._move_script(
+                    keys=[_POOL_MEMBERS_KEY, _POOL_SEGMENTS_KEY, f"discover_pool_gone:{user_id}"],
+                    args=[
+                        user_id,
+                        updated_at.isoformat(timespec="microseconds") if updated_at is not None else deleted_at,
+                        segment,
+                        created_at.replace(tzinfo=UTC).timestamp() if created_at is not None else 0,
+                        _POOL_TOMBSTONE_SECONDS,
+                    ],
+                    client=pipe,
+                )
+            await pipe.execute()
+
+
+@dataclass(frozen=True, slots=True)
+class _RefillJob:
+    viewer_id: int
+    gender: str
+    seeking: str
+    latitude: float | None
+    longitude: float | None
+    region: str | None
+    shown_id: int | None
+
+    @classmethod
+    def from_viewer(cls, viewer: Mapping[str, object], shown_id: int | None) -> "_RefillJob":
+        return cls(
+            viewer_id=int(viewer["user_id"]),  # type: ignore[arg-type]
+            gender=str(viewer["gender"]),
+            seeking=str(viewer["seeking"]),
+            latitude=viewer["latitude"],  # type: ignore[arg-type]
+            longitude=viewer["longitude"],  # type: ignore[arg-type]
+            region=viewer["location_region"],  # type: ignore[arg-type]
+            shown_id=shown_id,
+        )
 
 
 class DiscoveryService:
-    def __init__(self, users: UserRepository, redis_client: Redis) -> None:
+    def __init__(
+        self,
+        users: UserRepository,
+        redis_client: Redis,
+        refill_watermark: int = 10,
+        refill_workers: int = 4,
+        prefetch_cards: int = 10,
+        actions: ActionRepository | None = None,
+        seen_filter_min_actions: int = 0,
+        segment_pools: bool = False,
+        engine: str = "sql",
+    ) -> None:
         self.users = users
         self.redis = redis_client
+        self.refill_watermark = refill_watermark
+        self.refill_workers = refill_workers
+        # Profiles of the next N queued candidates are kept in the profile cache so a card
+        # renders from the pop script's reply alone.
+        self.prefetch_cards = prefetch_cards if users.cache is not None else 0
+        # Viewers with at least this many swipes get a seen filter that replaces the actions
+        # anti-join in refill queries.
+        self.actions = actions
+        self.seen_filter_min_actions = seen_filter_min_actions
+        self.seen_filter = None
+        if actions is not None and seen_filter_min_actions > 0:
+            self.seen_filter = SeenFilter(redis_client, ttl_seconds=_SEEN_TTL_SECONDS)
+        self.pools = None
+        if actions is not None and segment_pools:
+            self.pools = SegmentPools(users, actions, redis_client)
+            users.listeners.append(self.pools.on_user_changed)
+        # DISCOVERY_ENGINE=memory ranks every refill from a NumPy snapshot of discoverable users.
+        self.engine = None
+        if actions is not None and engine == "memory":
+            self.engine = MemoryCandidateEngine(users, redis_client)
+            users.listeners.append(self.engine.on_user_changed)
+        self._refill_jobs: asyncio.Queue[_RefillJob] = asyncio.Queue(maxsize=_REFILL_BACKLOG)
+        self._refill_pending: set[int] = set()
+        self._refill_tasks: list[asyncio.Task[None]] = []
+        self._background_tasks: list[asyncio.Task[None]] = []
+        self._pop_script = redis_client.register_script(_POP_CANDIDATE_SCRIPT)
+        self._release_lock = redis_client.register_script(_RELEASE_LOCK_SCRIPT)
+        self.stale_skipped_total = 0
+
+    async def start(self) -> None:
+        if not self._background_tasks:
+            self._background_tasks.append(
+                asyncio.create_task(self._backfill_memberships(), name="discovery-members-backfill")
+            )
+            # Refills use Postgres until the pools are backfilled or the engine is loaded.
+            if self.pools is not None:
+                self._background_tasks.append(asyncio.create_task(self.pools.maintain(), name="discovery-pools"))
+            if self.engine is not None:
+                self._background_tasks.append(
+                    asyncio.create_task(self._warm_up("Candidate engine load", self.engine.start()))
+                )
+        if self._refill_tasks or self.refill_workers <= 0:
+            return
+        self._refill_tasks = [
+            asyncio.create_task(self._refill_worker(), name=f"discovery-refill-{index}")
+            for index in range(self.refill_workers)
+        ]
+
+    async def close(self) -> None:
+        tasks, self._refill_tasks = self._refill_tasks, []
+        tasks.extend(self._background_tasks)
+        self._background_tasks = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.engine is not None:
+            await self.engine.close()
 
     @staticmethod
     def _queue_key(user_id: int) -> str:
         return f"discover_queue:{user_id}"
 
+    @staticmethod
+    def _members_key(candidate_id: int | str) -> str:
+        return f"discover_members:{candidate_id}"
+
+    @staticmethod
+    def _seen_key(user_id: int) -> str:
+        return f"discover_seen:{user_id}"
+
     @staticmethod
     def _rewind_key(user_id: int) -> str:
         return f"rewind_last_dislike:{user_id}"
 
+    @staticmethod
+    def _refill_lock_key(user_id: int) -> str:
+        return f"discover_refill_lock:{user_id}"
+
+    @observe_redis("clear_queue")
     async def clear_queue(self, user_id: int) -> None:
         await self.redis.delete(self._queue_key(user_id))
 
+    @observe_redis("purge_candidate")
     async def purge_candidate_everywhere(self, candidate_id: int) -> None:
+        # Only the queues recorded in the candidate's membership set can hold it; entries for
+        # queues that were popped or cleared since are harmless no-op LREMs. The blocked set
+        # catches anything the index missed at pop time, including queues from before
+        # membership sets existed until _backfill_memberships has indexed them.
+        members_key = self._members_key(candidate_id)
+        viewer_ids = await self.redis.smembers(members_key)
         candidate = str(candidate_id)
         async with self.redis.pipeline(transaction=False) as pipe:
-            async for key in self.redis.scan_iter(match="discover_queue:*", count=200):
-                pipe.lrem(key, 0, candidate)
+            pipe.sadd(_BLOCKED_KEY, candidate)
+            for viewer_id in viewer_ids:
+                pipe.lrem(self._queue_key(int(viewer_id)), 0, candidate)
+            pipe.delete(members_key)
             await pipe.execute()
 
+    @observe_redis("restore_candidate")
+    async def restore_candidate(self, candidate_id: int) -> None:
+        await self.redis.srem(_BLOCKED_KEY, str(candidate_id))
+
+    @observe_redis("push_candidates")
     async def push_candidates(self, viewer_id: int, candidate_ids: list[int], to_front: bool = False) -> None:
         if not candidate_ids:
             return
         queue_key = self._queue_key(viewer_id)
-        if to_front:
-            await self.redis.lpush(queue_key, *[str(item) for item in candidate_ids[::-1]])
-            return
-        await self.redis.rpush(queue_key, *[str(item) for item in candidate_ids])
+        viewer = str(viewer_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if to_front:
+                pipe.lpush(queue_key, *[str(item) for item in candidate_ids[::-1]])
+            else:
+                pipe.rpush(queue_key, *[str(item) for item in candidate_ids])
+            pipe.expire(queue_key, _QUEUE_TTL_SECONDS)
+            for candidate_id in candidate_ids:
+                members_key = self._members_key(candidate_id)
+                pipe.sadd(members_key, viewer)
+                pipe.expire(members_key, _QUEUE_TTL_SECONDS)
+            await pipe.execute()
 
+    @observe_redis("push_candidate_to_viewers")
     async def push_candidate_to_viewers(self, candidate_id: int, viewer_ids: list[int]) -> None:
         if not viewer_ids:
             return
+        members_key = self._members_key(candidate_id)
         async with self.redis.pipeline(transaction=False) as pipe:
             for viewer_id in viewer_ids:
-                pipe.lpush(self._queue_key(viewer_id), str(candidate_id))
+                queue_key = self._queue_key(viewer_id)
+                pipe.lpush(queue_key, str(candidate_id))
+                pipe.expire(queue_key, _QUEUE_TTL_SECONDS)
+            pipe.sadd(members_key, *[str(viewer_id) for viewer_id in viewer_ids])
+            pipe.expire(members_key, _QUEUE_TTL_SECONDS)
             await pipe.execute()
 
-    async def set_last_disliked(self, user_id: int, target_id: int) -> None:
-        await self.redis.set(self._rewind_key(user_id), str(target_id), ex=24 * 60 * 60)
+    @observe_redis("remember_swipe")
+    async def remember_swipe(self, user_id: int, target_id: int, action: str) -> None:
+        seen_key = self._seen_key(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(seen_key, str(target_id))
+            pipe.expire(seen_key, _SEEN_TTL_SECONDS)
+            if action == "dislike":
+                pipe.set(self._rewind_key(user_id), str(target_id), ex=24 * 60 * 60)
+            if self.seen_filter is not None:
+                await self.seen_filter.add(user_id, target_id, client=pipe)
+            await pipe.execute()
 
+    @observe_redis("forget_swipe")
+    async def forget_swipe(self, user_id: int, target_id: int) -> None:
+        await self.redis.srem(self._seen_key(user_id), str(target_id))
+        if self.seen_filter is not None:
+            # A bloom filter cannot forget one id; the next refill rebuilds it from actions.
+            await self.seen_filter.drop(user_id)
+
+    @observe_redis("pop_last_disliked")
     async def pop_last_disliked(self, user_id: int) -> int | None:
         key = self._rewind_key(user_id)
         async with self.redis.pipeline(transaction=True) as pipe:
@@ -62,25 +541,201 @@ class DiscoveryService:
         except ValueError:
             return None
 
-    async def next_candidate_id(self, viewer: asyncpg.Record) -> int | None:
+    async def next_candidate(self, viewer: asyncpg.Record) -> tuple[int, Mapping[str, Any] | None] | None:
+        # Returns the candidate id and, when the profile cache had it, the candidate's profile.
         viewer_id = int(viewer["user_id"])
-        queue_key = self._queue_key(viewer_id)
-        candidate_raw = await self.redis.lpop(queue_key)
+        candidate_raw, remaining, profile = await self._pop_candidate(viewer_id)
 
         if candidate_raw is None:
-            candidate_ids = await self.users.list_candidate_ids(
-                viewer_id=viewer_id,
-                viewer_gender=viewer["gender"],
-                seeking=viewer["seeking"],
-                viewer_latitude=viewer["latitude"],
-                viewer_longitude=viewer["longitude"],
-                viewer_region=viewer["location_region"],
-            )
+            # Cold queue: the viewer has to wait for the query this one time.
+            candidate_ids = await self._list_candidates(_RefillJob.from_viewer(viewer, None))
             if not candidate_ids:
                 return None
-            await self.redis.rpush(queue_key, *[str(user_id) for user_id in candidate_ids])
-            candidate_raw = await self.redis.lpop(queue_key)
+            await self.push_candidates(viewer_id, candidate_ids)
+            if self.prefetch_cards > 0:
+                await self.users.get_many(candidate_ids[: self.prefetch_cards])
+            candidate_raw, remaining, profile = await self._pop_candidate(viewer_id)
 
         if candidate_raw is None:
             return None
-        return int(candidate_raw)
+        candidate_id = int(candidate_raw)
+        if remaining < self.refill_watermark:
+            self._schedule_refill(_RefillJob.from_viewer(viewer, candidate_id))
+        return candidate_id, profile
+
+    @observe_redis("pop_candidate")
+    async def _pop_candidate(self, viewer_id: int) -> tuple[str | None, int, Mapping[str, Any] | None]:
+        candidate, skipped, remaining, fields = await self._pop_script(
+            keys=[self._queue_key(viewer_id), self._seen_key(viewer_id), _BLOCKED_KEY],
+            args=[_POP_MAX_SKIPS, PROFILE_KEY_PREFIX if self.users.cache is not None else ""],
+        )
+        if skipped:
+            self.stale_skipped_total += int(skipped)
+            logger.debug("Skipped %s stale queue entries for viewer %s", skipped, viewer_id)
+        if not candidate:
+            return None, int(remaining), None
+        profile = None
+        if self.users.cache is not None:
+            profile = self.users.cache.adopt(int(candidate), dict(zip(fields[::2], fields[1::2])))
+        return str(candidate), int(remaining), profile
+
+    async def _list_candidates(self, job: _RefillJob) -> list[int]:
+        if self.engine is not None and self.engine.ready and self.actions is not None:
+            return await self._rank_in_memory(self.engine, self.actions, job)
+        if self.pools is not None and (job.latitude is None or job.longitude is None) and await self.pools.ready():
+            candidate_ids = await self.pools.list_candidate_ids(job.viewer_id, job.gender, job.seeking, job.region)
+            if candidate_ids is not None:
+                return candidate_ids
+        return await self.users.list_candidate_ids(
+            viewer_id=job.viewer_id,
+            viewer_gender=job.gender,
+            seeking=job.seeking,
+            viewer_latitude=job.latitude,
+            viewer_longitude=job.longitude,
+            viewer_region=job.region,
+            screen=await self._seen_screen(job.viewer_id),
+            overfetch=_SEEN_FILTER_OVERFETCH,
+        )
+
+    async def _rank_in_memory(self, engine: MemoryCandidateEngine, actions: ActionRepository, job: _RefillJob) -> list[int]:
+        # The snapshot has no actions: the seen set stands in for the anti-join and the exact
+        # check catches swipes it no longer holds, as in SegmentPools.list_candidate_ids.
+        excluded = await self._load_seen(job.viewer_id)
+        candidate_ids: list[int] = []
+        for _ in range(_VERIFY_ROUNDS):
+            # Off the event loop: a full scan takes milliseconds on large tables.
+            candidate_ids = await asyncio.to_thread(
+                engine.rank,
+                job.viewer_id,
+                job.gender,
+                job.seeking,
+                job.latitude,
+                job.longitude,
+                job.region,
+                exclude=excluded,
+            )
+            swiped = await actions.swiped_among(job.viewer_id, candidate_ids)
+            if not swiped:
+                break
+            if len(swiped) * 2 > len(candidate_ids):
+                swiped = set(await actions.list_target_ids(job.viewer_id))
+            excluded |= swiped
+            await _remember_seen(self.redis, job.viewer_id, swiped)
+        return [candidate_id for candidate_id in candidate_ids if candidate_id not in excluded]
+
+    @observe_redis("load_seen")
+    async def _load_seen(self, viewer_id: int) -> set[int]:
+        return {int(target_id) for target_id in await self.redis.smembers(self._seen_key(viewer_id))}
+
+    async def _seen_screen(self, viewer_id: int) -> CandidateScreen | None:
+        seen_filter, actions = self.seen_filter, self.actions
+        if seen_filter is None or actions is None:
+            return None
+        status = await seen_filter.status(viewer_id)
+        if status.skipped:
+            return None
+        if not status.exists:
+            swipes = await actions.count_up_to(viewer_id, self.seen_filter_min_actions)
+            if swipes < self.seen_filter_min_actions:
+                await seen_filter.skip(viewer_id, _SEEN_FILTER_SKIP_SECONDS)
+                return None
+        if not status.exists or status.saturated:
+            await seen_filter.build(viewer_id, await actions.list_target_ids(viewer_id))
+            SEEN_FILTER_EVENTS.labels("built").inc()
+
+        async def screen(candidate_ids: list[int]) -> list[int] | None:
+            flags = await seen_filter.check(viewer_id, candidate_ids)
+            if flags is None:
+                SEEN_FILTER_EVENTS.labels("missing").inc()
+                return None
+            passed = [candidate_id for candidate_id, flagged in zip(candidate_ids, flags) if not flagged]
+            SEEN_FILTER_EVENTS.labels("flagged").inc(len(candidate_ids) - len(passed))
+            # The filter has no false negatives for swipes it was told about, but a swipe can
+            # land between a build's SELECT and its SET, so survivors are checked exactly.
+            swiped = await actions.swiped_among(viewer_id, passed)
+            if swiped:
+                SEEN_FILTER_EVENTS.labels("verified_swiped").inc(len(swiped))
+            return [candidate_id for candidate_id in passed if candidate_id not in swiped]
+
+        return screen
+
+    def _schedule_refill(self, job: _RefillJob) -> None:
+        if not self._refill_tasks or job.viewer_id in self._refill_pending:
+            return
+        try:
+            self._refill_jobs.put_nowait(job)
+        except asyncio.QueueFull:
+            return
+        self._refill_pending.add(job.viewer_id)
+
+    async def _backfill_memberships(self) -> None:
+        # Until this has run, a ban cannot LREM the candidate from older queues; the blocked
+        # set still keeps it from being shown, since the pop script skips blocked ids.
+        try:
+            if await self.redis.exists(_MEMBERS_BACKFILLED_KEY):
+                return
+            if not await self.redis.set(
+                _MEMBERS_BACKFILL_LOCK_KEY, "1", nx=True, ex=_MEMBERS_BACKFILL_LOCK_SECONDS
+            ):
+                return
+            queues = 0
+            async for queue_key in self.redis.scan_iter(match="discover_queue:*", count=500):
+                viewer = queue_key.removeprefix("discover_queue:")
+                candidate_ids = await self.redis.lrange(queue_key, 0, -1)
+                if not candidate_ids:
+                    continue
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for candidate_id in set(candidate_ids):
+                        members_key = self._members_key(candidate_id)
+                        pipe.sadd(members_key, viewer)
+                        pipe.expire(members_key, _QUEUE_TTL_SECONDS)
+                    await pipe.execute()
+                queues += 1
+            await self.redis.set(_MEMBERS_BACKFILLED_KEY, "1", ex=_QUEUE_TTL_SECONDS)
+            logger.info("Backfilled queue membership for %s queues", queues)
+        except RedisError:
+            # The lock expires, and the next replica to start tries again.
+            logger.warning("Queue membership backfill failed", exc_info=True)
+
+    async def _warm_up(self, label: str, step: Awaitable[None]) -> None:
+        try:
+            await step
+        except Exception:
+            logger.exception("%s failed; refills keep using Postgres", label)
+
+    async def _refill_worker(self) -> None:
+        while True:
+            job = await self._refill_jobs.get()
+            try:
+                await self._refill(job)
+            except Exception:
+                logger.exception("Background refill failed for viewer %s", job.viewer_id)
+            finally:
+                self._refill_pending.discard(job.viewer_id)
+                self._refill_jobs.task_done()
+
+    async def _refill(self, job: _RefillJob) -> None:
+        # The Redis lock dedupes refills for the same viewer across workers and replicas.
+        lock_key = self._refill_lock_key(job.viewer_id)
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, ex=_REFILL_LOCK_SECONDS):
+            return
+        try:
+            queue_key = self._queue_key(job.viewer_id)
+            queued = set(await self.redis.lrange(queue_key, 0, -1))
+            if len(queued) >= self.refill_watermark:
+                return
+            # Candidates still queued or currently on screen have no action yet, so the
+            # query returns them again; only append the ones the viewer has not been given.
+            if job.shown_id is not None:
+                queued.add(str(job.shown_id))
+            candidate_ids = await self._list_candidates(job)
+            await self.push_candidates(
+                job.viewer_id,
+                [candidate_id for candidate_id in candidate_ids if str(candidate_id) not in queued],
+            )
+            if self.prefetch_cards > 0:
+                upcoming = await self.redis.lrange(queue_key, 0, self.prefetch_cards - 1)
+                await self.users.get_many([int(candidate_id) for candidate_id in upcoming])
+        finally:
+            await self._release_lock(keys=[lock_key], args=[token])
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import uuid
+from collections.abc import Awaitable, Callable
+from time import monotonic, time
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from app.ingest import update_shard_key
+
+logger = logging.getLogger(__name__)
+
+UPDATE_BUS_GROUP = "bot-workers"
+_WORKERS_KEY = "updates:workers"
+
+_RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+return 0
+"""
+
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class UpdateBus:
+    def __init__(self, redis_client: Redis, partitions: int = 8, max_length: int = 100_000) -> None:
+        self.redis = redis_client
+        self.partitions = max(1, partitions)
+        self.max_length = max_length
+
+    @staticmethod
+    def stream_key(partition: int) -> str:
+        return f"updates:{partition}"
+
+    @staticmethod
+    def lease_key(partition: int) -> str:
+        return f"updates:lease:{partition}"
+
+    async def ensure_groups(self) -> None:
+        for partition in range(self.partitions):
+            try:
+                await self.redis.xgroup_create(self.stream_key(partition), UPDATE_BUS_GROUP, id="0", mkstream=True)
+            except ResponseError as exc:
+                if "BUSYGROUP" not in str(exc):
+                    raise
+
+    async def publish(self, update: Update) -> str:
+        partition = update_shard_key(update) % self.partitions
+        payload = update.model_dump_json(exclude_unset=True)
+        return await self.redis.xadd(
+            self.stream_key(partition),
+            {"update": payload},
+            maxlen=self.max_length,
+            approximate=True,
+        )
+
+
+class BusPublishMiddleware(BaseMiddleware):
+    def __init__(self, bus: UpdateBus) -> None:
+        self.bus = bus
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            await self.bus.publish(event)
+        return None
+
+
+def build_ingress_dispatcher(bus: UpdateBus) -> Dispatcher:
+    # Receives updates (polling or webhook) and only writes them to the bus; workers run handlers.
+    ingress = Dispatcher()
+    ingress.update.outer_middleware(BusPublishMiddleware(bus))
+    return ingress
+
+
+class UpdateBusWorker:
+    def __init__(
+        self,
+        bus: UpdateBus,
+        dp: Dispatcher,
+        bot: Bot,
+        consumer: str | None = None,
+        lease_seconds: int = 30,
+        block_ms: int = 2000,
+        batch_size: int = 10,
+    ) -> None:
+        self.bus = bus
+        self.redis = bus.redis
+        self.dp = dp
+        self.bot = bot
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self._renew_lease = self.redis.register_script(_RENEW_LEASE_SCRIPT)
+        self._release_lease = self.redis.register_script(_RELEASE_LEASE_SCRIPT)
+        self._partitions: dict[int, tuple[asyncio.Task[None], asyncio.Event]] = {}
+        # Leases held, with when each was last renewed; includes partitions being handed off.
+        self._leases: dict[int, float] = {}
+        self._handoffs: set[asyncio.Task[None]] = set()
+        self.processed_total = 0
+        self.failed_total = 0
+
+    async def run(self) -> None:
+        await self.bus.ensure_groups()
+        renewer = asyncio.create_task(self._renew_leases(), name="update-bus-leases")
+        try:
+            while True:
+                await self._rebalance()
+                await asyncio.sleep(self.lease_seconds / 3)
+        finally:
+            for partition in list(self._partitions):
+                self._stop_partition(partition)
+            await asyncio.gather(*self._handoffs, return_exceptions=True)
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+            await self.redis.zrem(_WORKERS_KEY, self.consumer)
+
+    async def _renew_leases(self) -> None:
+        # Separate from _rebalance so a slow handoff or Redis call there cannot let a lease lapse.
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            for partition in list(self._leases):
+                try:
+                    renewed = await self._renew_lease(
+                        keys=[self.bus.lease_key(partition)],
+                        args=[self.consumer, self.lease_seconds],
+                    )
+                except RedisError:
+                    logger.warning("Could not renew lease on update partition %s", partition, exc_info=True)
+                    renewed = monotonic() - self._leases.get(partition, 0.0) < self.lease_seconds
+                else:
+                    if renewed and partition in self._leases:
+                        self._leases[partition] = monotonic()
+                if not renewed:
+                    logger.warning("Lost lease on update partition %s", partition)
+                    self._lose_partition(partition)
+
+    async def _rebalance(self) -> None:
+        now = time()
+        await self.redis.zadd(_WORKERS_KEY, {self.consumer: now})
+        await self.redis.zremrangebyscore(_WORKERS_KEY, "-inf", now - self.lease_seconds)
+        live_workers = max(1, int(await self.redis.zcard(_WORKERS_KEY)))
+        fair_share = math.ceil(self.bus.partitions / live_workers)
+
+        for partition, (task, _) in list(self._partitions.items()):
+            if task.done():
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error("Update bus partition %s stopped", partition, exc_info=task.exception())
+                self._stop_partition(partition)
+
+        while len(self._partitions) > fair_share:
+            self._stop_partition(next(iter(self._partitions)))
+
+        offset = random.randrange(self.bus.partitions)
+        for step in range(self.bus.partitions):
+            if len(self._partitions) >= fair_share:
+                break
+            partition = (offset + step) % self.bus.partitions
+            if partition in self._leases:
+                continue
+            acquired = await self.redis.set(
+                self.bus.lease_key(partition),
+                self.consumer,
+                nx=True,
+                ex=self.lease_seconds,
+            )
+            if acquired:
+                self._leases[partition] = monotonic()
+                stop = asyncio.Event()
+                task = asyncio.create_task(self._consume(partition, stop), name=f"update-bus-{partition}")
+                self._partitions[partition] = (task, stop)
+
+    def _stop_partition(self, partition: int) -> None:
+        # Hands the partition back in the background once the entry in flight is acknowledged;
+        # the lease is renewed until then.
+        task, stop = self._partitions.pop(partition)
+        stop.set()
+        handoff = asyncio.create_task(self._hand_off(partition, task))
+        self._handoffs.add(handoff)
+        handoff.add_done_callback(self._handoffs.discard)
+
+    async def _hand_off(self, partition: int, task: asyncio.Task[None]) -> None:
+        await asyncio.gather(task, return_exceptions=True)
+        if self._leases.pop(partition, None) is None:
+            return
+        try:
+            await self._release_lease(keys=[self.bus.lease_key(partition)], args=[self.consumer])
+        except RedisError:
+            logger.warning("Could not release update partition %s; it frees up when the lease expires", partition)
+
+    def _lose_partition(self, partition: int) -> None:
+        # Another worker may already own the partition: stop at once rather than finish the
+        # entry in flight. It stays pending and the new owner claims it once it is idle.
+        self._leases.pop(partition, None)
+        consumer = self._partitions.pop(partition, None)
+        if consumer is not None:
+            consumer[0].cancel()
+
+    async def _consume(self, partition: int, stop: asyncio.Event) -> None:
+        stream = self.bus.stream_key(partition)
+
+        # Holding the lease means the previous owner is gone or stopping: take over its pending
+        # entries, oldest first, so per-user order survives a worker crash. Entries delivered
+        # less than a lease ago may still be running on a worker that has not noticed it lost
+        # the lease, so they are left until they go idle, and nothing new is read before then.
+        min_idle_ms = self.lease_seconds * 1000
+        while not stop.is_set():
+            cursor = "0-0"
+            while not stop.is_set():
+                cursor, claimed, _ = await self.redis.xautoclaim(
+                    stream,
+                    UPDATE_BUS_GROUP,
+                    self.consumer,
+                    min_idle_time=min_idle_ms,
+                    start_id=cursor,
+                    count=self.batch_size,
+                )
+                await self._handle_entries(stream, claimed)
+                if cursor == "0-0":
+                    break
+            pending = await self.redis.xpending(stream, UPDATE_BUS_GROUP)
+            if not pending["pending"]:
+                break
+            await asyncio.sleep(self.lease_seconds / 3)
+
+        while not stop.is_set():
+            response = await self.redis.xreadgroup(
+                UPDATE_BUS_GROUP,
+                self.consumer,
+                {stream: ">"},
+                count=self.batch_size,
+                block=self.block_ms,
+            )
+            if response:
+                await self._handle_entries(stream, response[0][1], stop)
+
+    async def _handle_entries(
+        self,
+        stream: str,
+        entries: list[tuple[str, dict[str, str] | None]],
+        stop: asyncio.Event | None = None,
+    ) -> None:
+        for entry_id, fields in entries:
+            if stop is not None and stop.is_set():
+                return
+            if fields:
+                await self._process(fields)
+            await self.redis.xack(stream, UPDATE_BUS_GROUP, entry_id)
+
+    async def _process(self, fields: dict[str, str]) -> None:
+        try:
+            update = Update.model_validate(json.loads(fields["update"]), context={"bot": self.bot})
+            result = await self.dp.feed_update(self.bot, update)
+            if isinstance(result, TelegramMethod):
+                await self.dp.silent_call_request(bot=self.bot, result=result)
+            self.processed_total += 1
+        except Exception:
+            # Acknowledged anyway: a poison update must not block the user's partition forever.
+            self.failed_total += 1
+            logger.exception("Update from bus failed")
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.db import Database, Row
+from app.repositories import ActionRepository, UserRepository
+
+QueryCall = Callable[[], Awaitable[Any]]
+
+CASES = (
+    "list_candidate_ids_gps",
+    "list_candidate_ids_region",
+    "list_boost_viewer_ids",
+    "list_incoming_likes",
+)
+
+
+async def sample_population(db: Database, viewers: int, seed: int) -> tuple[list[Row], list[int]]:
+    # Viewers are complete profiles (with and without GPS); incoming-like targets mix the most
+    # liked profiles with ordinary ones so both ends of the power law are measured.
+    rows = await db.fetch(
+        """
+        SELECT user_id, gender, seeking, latitude, longitude, location_region
+        FROM users
+        WHERE is_banned = FALSE AND photo_id IS NOT NULL AND location_region IS NOT NULL
+        ORDER BY user_id
+        """
+    )
+    popular = await db.fetch(
+        """
+        SELECT target_id
+        FROM actions
+        WHERE action_type IN ('like', 'superlike')
+        GROUP BY target_id
+        ORDER BY count(*) DESC
+        LIMIT $1
+        """,
+        max(1, viewers // 2),
+    )
+    rng = random.Random(seed)
+    sampled = rng.sample(list(rows), min(viewers, len(rows)))
+    targets = [int(row["target_id"]) for row in popular] + [int(row["user_id"]) for row in sampled[: viewers // 2]]
+    return sampled, targets
+
+
+def build_calls(db: Database, viewers: list[Row], targets: list[int]) -> dict[str, list[QueryCall]]:
+    users = UserRepository(db)
+    actions = ActionRepository(db)
+    calls: dict[str, list[QueryCall]] = {case: [] for case in CASES}
+    for viewer in viewers:
+        viewer_id, gender, seeking = viewer["user_id"], viewer["gender"], viewer["seeking"]
+        latitude, longitude, region = viewer["latitude"], viewer["longitude"], viewer["location_region"]
+        if latitude is not None:
+            calls["list_candidate_ids_gps"].append(
+                lambda v=viewer_id, g=gender, s=seeking, la=latitude, lo=longitude, r=region: users.list_candidate_ids(
+                    v, g, s, la, lo, r
+                )
+            )
+        calls["list_candidate_ids_region"].append(
+            lambda v=viewer_id, g=gender, s=seeking, r=region: users.list_candidate_ids(v, g, s, None, None, r)
+        )
+        calls["list_boost_viewer_ids"].append(
+            lambda v=viewer_id, g=gender, s=seeking, r=region: users.list_boost_viewer_ids(v, g, s, r)
+        )
+    for target_id in targets:
+        calls["list_incoming_likes"].append(lambda t=target_id: actions.list_incoming_likes(t))
+    return calls
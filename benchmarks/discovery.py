@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from app.db import DATABASE_BACKENDS, Database
+from app.migrations import migrate
+from benchmarks.cases import CASES, build_calls, sample_population
+from benchmarks.explain import ExplainingDatabase, summarize_plans
+from benchmarks.seed import database_dsn, recreate_database, seed_population
+
+# Latency percentiles and rows scanned for the discovery repository queries at several population
+# sizes. Writes one JSON document (sorted keys) so runs from different commits diff cleanly:
+#   python -m benchmarks.discovery --dsn postgresql://postgres@localhost/postgres --output bench.json
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    # Nearest-rank percentile.
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _time_calls(calls: list[Any], iterations: int) -> dict[str, float]:
+    latencies: list[float] = []
+    for index in range(iterations):
+        call = calls[index % len(calls)]
+        started = perf_counter()
+        await call()
+        latencies.append((perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "calls": iterations,
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+async def _rows_scanned(dsn: str, viewers: list[Any], targets: list[int], samples: int) -> dict[str, dict[str, float]]:
+    explaining = ExplainingDatabase(dsn)
+    await explaining.connect()
+    try:
+        result: dict[str, dict[str, float]] = {}
+        for case, calls in build_calls(explaining, viewers[:samples], targets[:samples]).items():
+            scanned: list[int] = []
+            queries: list[int] = []
+            for call in calls:
+                explaining.plans = []
+                await call()
+                summary = summarize_plans(explaining.plans)
+                scanned.append(summary["rows_scanned"])
+                queries.append(summary["queries"])
+            if scanned:
+                result[case] = {
+                    "rows_scanned_median": statistics.median(scanned),
+                    "rows_scanned_max": max(scanned),
+                    "round_trips_mean": round(statistics.fmean(queries), 2),
+                }
+        return result
+    finally:
+        await explaining.close()
+
+
+async def run_scale(args: argparse.Namespace, users: int) -> dict[str, Any]:
+    await recreate_database(args.dsn, args.database)
+    dsn = database_dsn(args.dsn, args.database)
+    db = Database(dsn, backend=args.backend)
+    await db.connect()
+    try:
+        await migrate(db)
+        async with db.raw_connection() as conn:
+            dataset = await seed_population(conn, users, args.actions_per_user, args.seed)
+        viewers, targets = await sample_population(db, args.viewers, args.seed)
+        calls = build_calls(db, viewers, targets)
+
+        queries: dict[str, Any] = {}
+        for case in CASES:
+            if not calls[case]:
+                continue
+            await _time_calls(calls[case], min(len(calls[case]), 10))
+            queries[case] = await _time_calls(calls[case], args.iterations)
+            print(f"{users:>9} {case:<28} p50 {queries[case]['p50_ms']:>8} ms  p99 {queries[case]['p99_ms']:>8} ms", file=sys.stderr)
+    finally:
+        await db.close()
+
+    for case, scanned in (await _rows_scanned(dsn, viewers, targets, args.explain_samples)).items():
+        queries[case].update(scanned)
+    return {"dataset": dataset, "queries": queries}
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    report: dict[str, Any] = {
+        "revision": _git_revision(),
+        "backend": args.backend,
+        "settings": {
+            "actions_per_user": args.actions_per_user,
+            "iterations": args.iterations,
+            "viewers": args.viewers,
+            "seed": args.seed,
+        },
+        "scales": {},
+    }
+    for users in args.scales:
+        report["scales"][str(users)] = await run_scale(args, users)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark discovery repository queries on synthetic populations.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--database", default="phusar_bench")
+    parser.add_argument("--backend", choices=sorted(DATABASE_BACKENDS), default="asyncpg")
+    parser.add_argument(
+        "--scales",
+        type=lambda raw: [int(item) for item in raw.split(",") if item.strip()],
+        default=[10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--actions-per-user", type=int, default=10)
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--explain-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(document)
+    else:
+        args.output.write_text(document + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from redis.asyncio import Redis
+
+from app.candidate_engine import MemoryCandidateEngine
+from app.db import DATABASE_BACKENDS, Database
+from app.migrations import migrate
+from app.repositories import ActionRepository, UserRepository
+from benchmarks.cases import QueryCall, sample_population
+from benchmarks.discovery import _git_revision, _time_calls
+from benchmarks.seed import database_dsn, recreate_database, seed_population
+
+# Refill candidate ranking through Postgres (list_candidate_ids) against the DISCOVERY_ENGINE=memory
+# NumPy snapshot at several population sizes, as one JSON document:
+#   python -m benchmarks.engine --dsn postgresql://postgres@localhost/postgres --output engine.json
+# memory_rank is the in-process ranking alone with the viewer's swipes as the exclusion set (a warm
+# seen set); memory_refill adds the exact actions check a refill makes. Redis is never contacted.
+
+
+async def run_scale(args: argparse.Namespace, population: int) -> dict[str, Any]:
+    await recreate_database(args.dsn, args.database)
+    db = Database(database_dsn(args.dsn, args.database), backend=args.backend)
+    await db.connect()
+    try:
+        await migrate(db)
+        async with db.raw_connection() as conn:
+            dataset = await seed_population(conn, population, args.actions_per_user, args.seed)
+        users = UserRepository(db)
+        actions = ActionRepository(db)
+        engine = MemoryCandidateEngine(users, Redis())
+        started = perf_counter()
+        await engine.load()
+        load_ms = (perf_counter() - started) * 1000
+
+        viewers, _ = await sample_population(db, args.viewers, args.seed)
+        calls: dict[str, list[QueryCall]] = {"sql": [], "memory_rank": [], "memory_refill": []}
+        matching = 0
+        for viewer in viewers:
+            query = (
+                int(viewer["user_id"]),
+                str(viewer["gender"]),
+                str(viewer["seeking"]),
+                viewer["latitude"],
+                viewer["longitude"],
+                viewer["location_region"],
+            )
+            swiped = set(await actions.list_target_ids(query[0]))
+            if await users.list_candidate_ids(*query) == engine.rank(*query, exclude=swiped):
+                matching += 1
+
+            async def rank(query: tuple[Any, ...] = query, swiped: set[int] = swiped) -> list[int]:
+                return engine.rank(*query, exclude=swiped)
+
+            async def refill(query: tuple[Any, ...] = query, swiped: set[int] = swiped) -> set[int]:
+                return await actions.swiped_among(query[0], engine.rank(*query, exclude=swiped))
+
+            calls["sql"].append(lambda query=query: users.list_candidate_ids(*query))
+            calls["memory_rank"].append(rank)
+            calls["memory_refill"].append(refill)
+
+        paths: dict[str, Any] = {}
+        for path, path_calls in calls.items():
+            await _time_calls(path_calls, min(len(path_calls), 10))
+            paths[path] = await _time_calls(path_calls, args.iterations)
+            print(f"{population:>9} {path:<14} p50 {paths[path]['p50_ms']:>8} ms  p99 {paths[path]['p99_ms']:>8} ms", file=sys.stderr)
+    finally:
+        await db.close()
+    return {
+        "dataset": dataset,
+        "engine": {"rows": engine.rows, "bytes": engine.nbytes, "load_ms": round(load_ms, 1)},
+        "identical_results": f"{matching}/{len(viewers)}",
+        "paths": paths,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    report: dict[str, Any] = {
+        "revision": _git_revision(),
+        "backend": args.backend,
+        "settings": {
+            "actions_per_user": args.actions_per_user,
+            "iterations": args.iterations,
+            "viewers": args.viewers,
+            "seed": args.seed,
+        },
+        "scales": {},
+    }
+    for population in args.scales:
+        report["scales"][str(population)] = await run_scale(args, population)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the SQL and in-memory discovery candidate engines.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--database", default="phusar_bench")
+    parser.add_argument("--backend", choices=sorted(DATABASE_BACKENDS), default="asyncpg")
+    parser.add_argument(
+        "--scales",
+        type=lambda raw: [int(item) for item in raw.split(",") if item.strip()],
+        default=[10_000, 100_000],
+    )
+    parser.add_argument("--actions-per-user", type=int, default=10)
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(document)
+    else:
+        args.output.write_text(document + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
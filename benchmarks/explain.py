@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from app.db import Database, Row
+
+_SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+# Bitmap index scans only feed a Bitmap Heap Scan; they are listed for the index name, not counted.
+_LISTED_NODES = _SCAN_NODES | {"Bitmap Index Scan"}
+
+
+class ExplainingDatabase(Database):
+    # Runs every repository read twice: once under EXPLAIN (ANALYZE, BUFFERS) to record the plan,
+    # then for real so the repository gets its rows. asyncpg backend only.
+    def __init__(self, dsn: str) -> None:
+        super().__init__(dsn, backend="asyncpg")
+        self.plans: list[dict[str, Any]] = []
+
+    async def fetch(self, query: str, *args: object) -> list[Row]:
+        if self.pool is None:
+            raise RuntimeError("ExplainingDatabase needs the asyncpg backend.")
+        async with self.pool.acquire() as conn:
+            plan = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *args)
+        self.plans.append(json.loads(plan)[0])
+        return await super().fetch(query, *args)
+
+
+def _walk(node: dict[str, Any]) -> list[dict[str, Any]]:
+    nodes = [node]
+    for child in node.get("Plans", ()):
+        nodes.extend(_walk(child))
+    return nodes
+
+
+def summarize_plans(plans: list[dict[str, Any]]) -> dict[str, Any]:
+    summary: dict[str, Any] = {
+        "queries": len(plans),
+        "execution_ms": 0.0,
+        "planning_ms": 0.0,
+        "rows_scanned": 0,
+        "rows_removed": 0,
+        "shared_hit": 0,
+        "shared_read": 0,
+        "scans": [],
+    }
+    for plan in plans:
+        summary["execution_ms"] += plan["Execution Time"]
+        summary["planning_ms"] += plan["Planning Time"]
+        root = plan["Plan"]
+        summary["shared_hit"] += root.get("Shared Hit Blocks", 0)
+        summary["shared_read"] += root.get("Shared Read Blocks", 0)
+        for node in _walk(root):
+            if node["Node Type"] not in _LISTED_NODES:
+                continue
+            scan = f"{node['Node Type']} on {node.get('Relation Name', '?')}"
+            if node.get("Index Name"):
+                scan = f"{node['Node Type']} using {node['Index Name']}"
+            if scan not in summary["scans"]:
+                summary["scans"].append(scan)
+            if node["Node Type"] not in _SCAN_NODES:
+                continue
+            loops = node.get("Actual Loops", 1)
+            removed = node.get("Rows Removed by Filter", 0) + node.get("Rows Removed by Index Recheck", 0)
+            summary["rows_scanned"] += node.get("Actual Rows", 0) * loops + removed * loops
+            summary["rows_removed"] += removed * loops
+    summary["execution_ms"] = round(summary["execution_ms"], 3)
+    summary["planning_ms"] = round(summary["planning_ms"], 3)
+    return summary
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count
+from time import time
+from typing import Any
+
+from aiohttp import web
+
+_BOT_USER = {"id": 1, "is_bot": True, "first_name": "Phu Sar", "username": "phusar_load_bot"}
+_SEND_METHODS = {"sendMessage", "sendPhoto"}
+
+
+@dataclass(slots=True)
+class RecordedCall:
+    method: str
+    chat_id: int | None
+    payload: dict[str, Any]
+
+
+@dataclass(slots=True)
+class FakeTelegram:
+    # Minimal Bot API: answers every method with a plausible result and records what was sent.
+    calls: list[RecordedCall] = field(default_factory=list)
+    methods: Counter[str] = field(default_factory=Counter)
+    # Newest card with swipe buttons per chat: (message_id, target user id).
+    cards: dict[int, tuple[int, int]] = field(default_factory=dict)
+    _message_ids: count = field(default_factory=lambda: count(1))
+    _runner: web.AppRunner | None = None
+
+    @property
+    def sends(self) -> int:
+        return sum(self.methods[method] for method in _SEND_METHODS)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        return f"http://{host}:{bound_port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            payload = await request.json()
+        else:
+            payload = dict(await request.post())
+        raw_chat_id = payload.get("chat_id")
+        chat_id = int(raw_chat_id) if raw_chat_id is not None else None
+        call = RecordedCall(method, chat_id, payload)
+        self.calls.append(call)
+        self.methods[method] += 1
+        result = self._result(method, payload)
+        if chat_id is not None and isinstance(result, dict):
+            target_id = swipe_target(call)
+            if target_id is not None:
+                self.cards[chat_id] = (result["message_id"], target_id)
+        return web.json_response({"ok": True, "result": result})
+
+    def _result(self, method: str, payload: dict[str, Any]) -> Any:
+        if method == "getMe":
+            return _BOT_USER
+        if method in _SEND_METHODS:
+            message: dict[str, Any] = {
+                "message_id": next(self._message_ids),
+                "date": int(time()),
+                "chat": {"id": int(payload["chat_id"]), "type": "private"},
+                "from": _BOT_USER,
+            }
+            if method == "sendPhoto":
+                message["photo"] = [{"file_id": str(payload.get("photo")), "file_unique_id": "u", "width": 1, "height": 1}]
+                if payload.get("caption"):
+                    message["caption"] = payload["caption"]
+            else:
+                message["text"] = payload.get("text", "")
+            return message
+        return True
+
+
+def callback_buttons(call: RecordedCall) -> list[str]:
+    raw = call.payload.get("reply_markup")
+    if not raw:
+        return []
+    markup = json.loads(raw) if isinstance(raw, str) else raw
+    return [
+        button["callback_data"]
+        for row in markup.get("inline_keyboard", [])
+        for button in row
+        if "callback_data" in button
+    ]
+
+
+def swipe_target(call: RecordedCall) -> int | None:
+    # Discovery cards and like-back notifications both carry act:{target}:like.
+    for data in callback_buttons(call):
+        parts = data.split(":")
+        if len(parts) == 3 and parts[0] == "act" and parts[2] == "like":
+            return int(parts[1])
+    return None
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from app.db import Row
+from app.migrations import MIGRATIONS_DIR, load_migrations, migrate
+from benchmarks.cases import CASES, build_calls, sample_population
+from benchmarks.explain import ExplainingDatabase, summarize_plans
+from benchmarks.seed import database_dsn, recreate_database, seed_population
+
+# EXPLAIN ANALYZE of the discovery queries on a synthetic population, before and after the
+# migrations newer than --baseline-version. Example:
+#   python -m benchmarks.index_comparison --dsn postgresql://postgres@localhost/postgres --users 100000
+
+
+async def _measure(db: ExplainingDatabase, viewers: list[Row], targets: list[int]) -> dict[str, list[dict[str, Any]]]:
+    results: dict[str, list[dict[str, Any]]] = {case: [] for case in CASES}
+    for case, calls in build_calls(db, viewers, targets).items():
+        for call in calls:
+            db.plans = []
+            await call()
+            results[case].append(summarize_plans(db.plans))
+    return results
+
+
+def _aggregate(samples: list[dict[str, Any]]) -> dict[str, Any]:
+    if not samples:
+        return {}
+    execution = sorted(sample["execution_ms"] for sample in samples)
+    scans: list[str] = []
+    for sample in samples:
+        scans.extend(scan for scan in sample["scans"] if scan not in scans)
+    return {
+        "samples": len(samples),
+        "median_ms": round(statistics.median(execution), 3),
+        "p95_ms": round(execution[min(len(execution) - 1, int(len(execution) * 0.95))], 3),
+        "mean_rows_scanned": round(statistics.fmean(sample["rows_scanned"] for sample in samples)),
+        "mean_shared_buffers": round(
+            statistics.fmean(sample["shared_hit"] + sample["shared_read"] for sample in samples)
+        ),
+        "scans": scans,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    await recreate_database(args.dsn, args.database)
+    db = ExplainingDatabase(database_dsn(args.dsn, args.database))
+    await db.connect()
+    try:
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            for migration in load_migrations():
+                if migration.version <= args.baseline_version:
+                    path = next(MIGRATIONS_DIR.glob(f"{migration.version:04d}_*.sql"))
+                    shutil.copy(path, baseline_dir)
+            await migrate(db, Path(baseline_dir))
+        async with db.raw_connection() as conn:
+            dataset = await seed_population(conn, args.users, args.actions_per_user, args.seed)
+
+        viewers, targets = await sample_population(db, args.viewers, args.seed)
+        await _measure(db, viewers[:3], targets[:3])
+        before = await _measure(db, viewers, targets)
+
+        applied = await migrate(db)
+        async with db.raw_connection() as conn:
+            await conn.execute("ANALYZE users")
+            await conn.execute("ANALYZE actions")
+        await _measure(db, viewers[:3], targets[:3])
+        after = await _measure(db, viewers, targets)
+    finally:
+        await db.close()
+
+    return {
+        "dataset": dataset,
+        "baseline_version": args.baseline_version,
+        "applied": applied,
+        "cases": {
+            case: {"before": _aggregate(before[case]), "after": _aggregate(after[case])}
+            for case in before
+        },
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"dataset: {report['dataset']}  migrations applied for 'after': {report['applied']}")
+    print(f"{'case':<28}{'median ms':>22}{'p95 ms':>22}{'rows scanned':>26}")
+    for case, result in report["cases"].items():
+        before, after = result["before"], result["after"]
+        if not before:
+            continue
+        print(
+            f"{case:<28}"
+            f"{before['median_ms']:>10} -> {after['median_ms']:<9}"
+            f"{before['p95_ms']:>10} -> {after['p95_ms']:<9}"
+            f"{before['mean_rows_scanned']:>12} -> {after['mean_rows_scanned']:<11}"
+        )
+        print(f"{'':<4}before: {'; '.join(before['scans'])}")
+        print(f"{'':<4}after:  {'; '.join(after['scans'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE discovery queries before and after new migrations.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--database", default="phusar_bench")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--actions-per-user", type=int, default=10)
+    parser.add_argument("--viewers", type=int, default=40)
+    parser.add_argument("--baseline-version", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    _print_report(report)
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from itertools import accumulate, count
+from pathlib import Path
+from time import perf_counter, time
+from typing import Any
+
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from app.config import Settings
+from app.db import DATABASE_BACKENDS
+from app.metrics import DB_QUERY_LATENCY, OUTBOUND_RESULTS, THROTTLE_DROPS
+from app.outbound import OUTBOUND_LANES
+from app.runtime import RuntimeResources, build_runtime, close_runtime, start_runtime
+from benchmarks.discovery import _git_revision, _percentile
+from benchmarks.fake_telegram import FakeTelegram
+from benchmarks.seed import REGIONS, database_dsn, recreate_database, seed_population
+
+# Replays synthetic users through registration -> discover -> like/pass (-> match) against the
+# real dispatcher from app.runtime.build_runtime, with Telegram replaced by a local fake Bot API:
+#   python -m benchmarks.load --dsn postgresql://postgres@localhost/postgres \
+#       --redis-url redis://localhost:6379/15 --users 200 --arrival-rate 20 --output load.json
+# The Redis database given is flushed first.
+
+_FAKE_TOKEN = "424242:load-test-token"
+_FIRST_SYNTHETIC_ID = 900_000_000
+_MUTUAL_LIKES_QUERY = """
+SELECT COUNT(*)
+FROM actions a
+JOIN actions b ON b.actor_id = a.target_id AND b.target_id = a.actor_id
+WHERE a.actor_id >= $1
+  AND a.actor_id < a.target_id
+  AND a.action_type IN ('like', 'superlike')
+  AND b.action_type IN ('like', 'superlike')
+"""
+_REGION_WEIGHTS = list(accumulate(region[1] for region in REGIONS))
+
+
+def _counter_total(metric: Any, suffix: str, **labels: str) -> float:
+    total = 0.0
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name.endswith(suffix) and all(sample.labels.get(key) == value for key, value in labels.items()):
+                total += sample.value
+    return total
+
+
+def _latency_summary(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(_percentile(ordered, 0.50), 3),
+        "p95_ms": round(_percentile(ordered, 0.95), 3),
+        "p99_ms": round(_percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+@dataclass(slots=True)
+class _LoadRun:
+    runtime: RuntimeResources
+    telegram: FakeTelegram
+    think_seconds: float
+    like_ratio: float
+    swipes: int
+    rng: random.Random
+    update_ids: count = field(default_factory=lambda: count(int(time())))
+    message_ids: count = field(default_factory=lambda: count(1))
+    latencies: defaultdict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: int = 0
+    swiped: int = 0
+
+    async def feed(self, phase: str, payload: dict[str, Any]) -> None:
+        runtime = self.runtime
+        payload["update_id"] = next(self.update_ids)
+        update = Update.model_validate(payload, context={"bot": runtime.bot})
+        started = perf_counter()
+        try:
+            result = await runtime.dp.feed_update(runtime.bot, update)
+            if isinstance(result, TelegramMethod):
+                await runtime.dp.silent_call_request(bot=runtime.bot, result=result)
+        except Exception:
+            self.errors += 1
+            logging.exception("Update in phase %s failed", phase)
+        self.latencies[phase].append((perf_counter() - started) * 1000)
+        await asyncio.sleep(self.think_seconds * self.rng.uniform(0.9, 1.3))
+
+    def message(self, user: dict[str, Any], **content: Any) -> dict[str, Any]:
+        return {
+            "message": {
+                "message_id": next(self.message_ids),
+                "date": int(time()),
+                "chat": {"id": user["id"], "type": "private"},
+                "from": user,
+                **content,
+            }
+        }
+
+    def callback(self, user: dict[str, Any], data: str, message_id: int | None = None) -> dict[str, Any]:
+        return {
+            "callback_query": {
+                "id": str(next(self.message_ids)),
+                "from": user,
+                "chat_instance": str(user["id"]),
+                "data": data,
+                "message": {
+                    "message_id": message_id or next(self.message_ids),
+                    "date": int(time()),
+                    "chat": {"id": user["id"], "type": "private"},
+                    "text": "...",
+                },
+            }
+        }
+
+    async def run_user(self, index: int) -> None:
+        user_id = _FIRST_SYNTHETIC_ID + index
+        user = {"id": user_id, "is_bot": False, "first_name": f"Load {index}", "language_code": "en"}
+        gender = "male" if index % 2 == 0 else "female"
+        seeking = "female" if gender == "male" else "male"
+        region, _, latitude, longitude, spread, _ = self.rng.choices(REGIONS, cum_weights=_REGION_WEIGHTS)[0]
+        location = {
+            "latitude": latitude + self.rng.uniform(-spread, spread),
+            "longitude": longitude + self.rng.uniform(-spread, spread),
+        }
+        photo = [{"file_id": f"load-photo-{index}", "file_unique_id": f"lp{index}", "width": 640, "height": 640}]
+
+        await self.feed("registration", self.message(user, text="/start"))
+        await self.feed("registration", self.callback(user, "lang:en"))
+        await self.feed("registration", self.message(user, text=f"Load {index}"))
+        await self.feed("registration", self.callback(user, f"gender:{gender}"))
+        await self.feed("registration", self.callback(user, f"seek:{seeking}"))
+        await self.feed("registration", self.callback(user, f"region:{region.lower()}"))
+        await self.feed("registration", self.message(user, location=location))
+        await self.feed("registration", self.message(user, text=str(self.rng.randint(18, 40))))
+        await self.feed("registration", self.message(user, text="Synthetic load-test profile."))
+        await self.feed("registration", self.message(user, photo=photo))
+
+        await self.feed("discover", self.callback(user, "menu:discover"))
+        for _ in range(self.swipes):
+            card = self.telegram.cards.pop(user_id, None)
+            if card is None:
+                # Queue ran dry (or the card has not arrived yet): ask again, like a user would.
+                await self.feed("discover", self.callback(user, "menu:discover"))
+                continue
+            message_id, target_id = card
+            action = "like" if self.rng.random() < self.like_ratio else "dislike"
+            await self.feed("swipe", self.callback(user, f"act:{target_id}:{action}", message_id))
+            self.swiped += 1
+
+
+async def _wait_for_outbound(runtime: RuntimeResources, timeout: float) -> None:
+    keys = [f"outbound:{lane}" for lane in OUTBOUND_LANES]
+    delayed = [f"outbound:delayed:{lane}" for lane in OUTBOUND_LANES]
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        async with runtime.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.llen(key)
+            for key in delayed:
+                pipe.zcard(key)
+            pending = sum(await pipe.execute())
+        if pending == 0:
+            break
+        await asyncio.sleep(0.2)
+    await asyncio.sleep(0.5)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    await recreate_database(args.dsn, args.database)
+    dsn = database_dsn(args.dsn, args.database)
+    telegram = FakeTelegram()
+    api_url = await telegram.start()
+
+    os.environ.setdefault("BOT_TOKEN", _FAKE_TOKEN)
+    os.environ.setdefault("DATABASE_URL", dsn)
+    settings = replace(
+        Settings.from_env(),
+        bot_token=_FAKE_TOKEN,
+        database_url=dsn,
+        database_backend=args.backend,
+        redis_url=args.redis_url,
+        telegram_api_url=api_url,
+        premium_enabled=False,
+    )
+    runtime = await build_runtime(settings)
+    try:
+        await runtime.redis.flushdb()
+        dataset = None
+        if args.population > 0:
+            async with runtime.db.raw_connection() as conn:
+                dataset = await seed_population(conn, args.population, args.actions_per_user, args.seed)
+        await start_runtime(runtime)
+
+        load = _LoadRun(
+            runtime=runtime,
+            telegram=telegram,
+            think_seconds=args.think_ms / 1000,
+            like_ratio=args.like_ratio,
+            swipes=args.swipes,
+            rng=random.Random(args.seed),
+        )
+        queries_before = _counter_total(DB_QUERY_LATENCY, "_count")
+        throttled_before = _counter_total(THROTTLE_DROPS, "_total")
+        queued_before = _counter_total(OUTBOUND_RESULTS, "_total", outcome="sent")
+        calls_before = len(telegram.calls)
+        sends_before = telegram.sends
+
+        started = perf_counter()
+        users: list[asyncio.Task[None]] = []
+        for index in range(args.users):
+            users.append(asyncio.create_task(load.run_user(index)))
+            await asyncio.sleep(1 / args.arrival_rate)
+        await asyncio.gather(*users)
+        elapsed = perf_counter() - started
+        await _wait_for_outbound(runtime, args.drain_timeout)
+
+        updates = sum(len(values) for values in load.latencies.values())
+        async with runtime.db.raw_connection() as conn:
+            matches = await conn.fetchval(_MUTUAL_LIKES_QUERY, _FIRST_SYNTHETIC_ID)
+        all_latencies = [value for values in load.latencies.values() for value in values]
+        return {
+            "revision": _git_revision(),
+            "backend": args.backend,
+            "settings": {
+                "users": args.users,
+                "arrival_rate": args.arrival_rate,
+                "swipes": args.swipes,
+                "like_ratio": args.like_ratio,
+                "think_ms": args.think_ms,
+                "population": args.population,
+                "seed": args.seed,
+            },
+            "dataset": dataset,
+            "updates": updates,
+            "errors": load.errors,
+            "duration_seconds": round(elapsed, 3),
+            "updates_per_second": round(updates / elapsed, 2),
+            "latency": {
+                "all": _latency_summary(all_latencies),
+                **{phase: _latency_summary(values) for phase, values in load.latencies.items()},
+            },
+            "db_round_trips_per_update": round((_counter_total(DB_QUERY_LATENCY, "_count") - queries_before) / updates, 2),
+            "bot_api_calls_per_update": round((len(telegram.calls) - calls_before) / updates, 2),
+            "sends_per_update": round((telegram.sends - sends_before) / updates, 2),
+            "outbound_sends_per_update": round(
+                (_counter_total(OUTBOUND_RESULTS, "_total", outcome="sent") - queued_before) / updates, 3
+            ),
+            "bot_api_methods": dict(sorted(telegram.methods.items())),
+            "throttled": int(_counter_total(THROTTLE_DROPS, "_total") - throttled_before),
+            "swipes": load.swiped,
+            "matches": int(matches),
+        }
+    finally:
+        await close_runtime(runtime)
+        await telegram.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay synthetic users against the dispatcher with a fake Bot API.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--database", default="phusar_load")
+    parser.add_argument("--backend", choices=sorted(DATABASE_BACKENDS), default="asyncpg")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--arrival-rate", type=float, default=10.0, help="New synthetic users per second.")
+    parser.add_argument("--swipes", type=int, default=20, help="Swipes per synthetic user.")
+    parser.add_argument("--like-ratio", type=float, default=0.6)
+    # Swipes are throttled to one per second per user; shorter think times measure the throttle.
+    parser.add_argument("--think-ms", type=int, default=1100)
+    parser.add_argument("--population", type=int, default=0, help="Seeded users to discover besides synthetic ones.")
+    parser.add_argument("--actions-per-user", type=int, default=10)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+    if args.arrival_rate <= 0:
+        parser.error("--arrival-rate must be positive")
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    report = asyncio.run(run(args))
+    print(
+        f"{report['updates']} updates, {report['updates_per_second']} updates/s, "
+        f"p99 {report['latency']['all']['p99_ms']} ms, {report['db_round_trips_per_update']} queries/update",
+        file=sys.stderr,
+    )
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is None:
+        print(document)
+    else:
+        args.output.write_text(document + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
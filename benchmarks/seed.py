@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from itertools import accumulate
+from urllib.parse import urlsplit, urlunsplit
+
+import asyncpg
+
+# (region as stored by registration, share of users, centre lat, centre lon, spread in degrees, townships)
+REGIONS = (
+    ("Yangon", 0.38, 16.84, 96.17, 0.12, ("Kamayut", "Hlaing", "Sanchaung", "Bahan", "Insein", "Thingangyun")),
+    ("Mandalay", 0.22, 21.96, 96.09, 0.10, ("Chanayethazan", "Mahaaungmye", "Pyigyidagun", "Amarapura")),
+    ("Naypyidaw", 0.06, 19.75, 96.12, 0.15, ("Zabuthiri", "Pyinmana", "Lewe", "Tatkon")),
+    ("Bago", 0.12, 17.34, 96.48, 0.35, ("Bago", "Taungoo", "Pyay", "Nyaunglebin")),
+    ("Ayeyarwady", 0.12, 16.78, 94.73, 0.40, ("Pathein", "Hinthada", "Myaungmya", "Maubin")),
+    ("Other", 0.10, 20.50, 95.50, 2.50, ("Taunggyi", "Myitkyina", "Mawlamyine", "Sittwe", "Monywa")),
+)
+USER_COLUMNS = (
+    "user_id",
+    "full_name",
+    "language",
+    "age",
+    "gender",
+    "seeking",
+    "location_region",
+    "township",
+    "latitude",
+    "longitude",
+    "bio",
+    "photo_id",
+    "is_banned",
+    "created_at",
+)
+ACTION_COLUMNS = ("actor_id", "target_id", "action_type", "created_at")
+_FIRST_USER_ID = 100_000_000
+
+
+def _seeking_for(rng: random.Random, gender: str) -> str:
+    roll = rng.random()
+    if roll < 0.85:
+        return "female" if gender == "male" else "male"
+    if roll < 0.95:
+        return "both"
+    return gender
+
+
+def user_records(users: int, seed: int = 7, now: datetime | None = None) -> Iterator[tuple[object, ...]]:
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    region_weights = list(accumulate(region[1] for region in REGIONS))
+    for index in range(users):
+        region, _, lat, lon, spread, townships = rng.choices(REGIONS, cum_weights=region_weights)[0]
+        gender = "male" if rng.random() < 0.56 else "female"
+        has_gps = rng.random() < 0.65
+        complete = rng.random() >= 0.08
+        yield (
+            _FIRST_USER_ID + index,
+            f"User {index}",
+            "my" if rng.random() < 0.7 else "en",
+            min(99, max(18, int(rng.triangular(18, 45, 24)))),
+            gender,
+            _seeking_for(rng, gender),
+            region if complete else None,
+            rng.choice(townships) if complete else None,
+            rng.gauss(lat, spread) if has_gps else None,
+            rng.gauss(lon, spread) if has_gps else None,
+            "Synthetic profile",
+            f"photo-{index}" if complete else None,
+            rng.random() < 0.01,
+            now - timedelta(seconds=rng.randrange(365 * 24 * 60 * 60)),
+        )
+
+
+def action_records(
+    users: int,
+    actions_per_user: int,
+    seed: int = 7,
+    now: datetime | None = None,
+) -> Iterator[tuple[object, ...]]:
+    # Popularity follows a power law over a shuffled ranking, so a few profiles collect most likes.
+    rng = random.Random(seed + 1)
+    now = now or datetime.utcnow()
+    ranked = [_FIRST_USER_ID + index for index in range(users)]
+    rng.shuffle(ranked)
+    cum_weights = list(accumulate(1.0 / (rank + 1) ** 0.9 for rank in range(users)))
+    for actor_id in range(_FIRST_USER_ID, _FIRST_USER_ID + users):
+        count = rng.randint(0, 2 * actions_per_user)
+        if count == 0:
+            continue
+        targets = set(rng.choices(ranked, cum_weights=cum_weights, k=count))
+        targets.discard(actor_id)
+        for target_id in targets:
+            roll = rng.random()
+            action_type = "dislike" if roll < 0.5 else "like" if roll < 0.95 else "superlike"
+            yield (
+                actor_id,
+                target_id,
+                action_type,
+                now - timedelta(seconds=rng.randrange(60 * 24 * 60 * 60)),
+            )
+
+
+async def seed_population(conn: asyncpg.Connection, users: int, actions_per_user: int, seed: int = 7) -> dict[str, int]:
+    now = datetime.utcnow()
+    await conn.copy_records_to_table("users", records=user_records(users, seed, now), columns=USER_COLUMNS)
+    await conn.copy_records_to_table(
+        "actions",
+        records=action_records(users, actions_per_user, seed, now),
+        columns=ACTION_COLUMNS,
+    )
+    await conn.execute("ANALYZE users")
+    await conn.execute("ANALYZE actions")
+    return {
+        "users": int(await conn.fetchval("SELECT count(*) FROM users")),
+        "actions": int(await conn.fetchval("SELECT count(*) FROM actions")),
+    }
+
+
+async def recreate_database(admin_dsn: str, name: str) -> None:
+    conn = await asyncpg.connect(admin_dsn)
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        await conn.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await conn.close()
+
+
+def database_dsn(admin_dsn: str, name: str) -> str:
+    parsed = urlsplit(admin_dsn)
+    return urlunsplit((parsed.scheme, parsed.netloc, f"/{name}", parsed.query, parsed.fragment))
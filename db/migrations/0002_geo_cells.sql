@@ -0,0 +1,4 @@
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS geo_cell_lat INTEGER GENERATED ALWAYS AS (floor(latitude * 10)::integer) STORED;
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS geo_cell_lon INTEGER GENERATED ALWAYS AS (floor(longitude * 10)::integer) STORED;
@@ -0,0 +1,2 @@
+-- migrate:no-transaction
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_geo_cell ON users (geo_cell_lat, geo_cell_lon) WHERE is_banned = FALSE;
@@ -0,0 +1,12 @@
+-- migrate:no-transaction
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_discoverable
+    ON users (gender, seeking, location_region, created_at DESC)
+    INCLUDE (latitude, longitude)
+    WHERE is_banned = FALSE
+      AND photo_id IS NOT NULL
+      AND age IS NOT NULL
+      AND location_region IS NOT NULL
+      AND township IS NOT NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_actions_target_type_created
+    ON actions (target_id, action_type, created_at DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_actions_target;
@@ -1,88 +1,43 @@
 from __future__ import annotations
 
-import asyncio
 import logging
-from dataclasses import dataclass
 
 from aiohttp import web
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
-from redis.asyncio import Redis
 
 from app.bot_commands import setup_default_commands
 from app.config import Settings
-from app.context import AppContext, set_app
-from app.db import Database
-from app.handlers import get_routers
-from app.middlewares import ThrottlingMiddleware
-from app.repositories import ActionRepository, PremiumRequestRepository, ReportRepository, UserRepository
-from app.services import DiscoveryService
-
-
-@dataclass(slots=True)
-class RuntimeResources:
-    settings: Settings
-    db: Database
-    redis: Redis
-    bot: Bot
-    dp: Dispatcher
-
-
-async def _build_runtime(settings: Settings) -> RuntimeResources:
-    db = Database(settings.database_url)
-    await db.connect()
-    await db.init_schema()
-
-    redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
-    storage = RedisStorage.from_url(settings.redis_url)
-    bot = Bot(
-        token=settings.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    dp = Dispatcher(storage=storage)
-    throttle = ThrottlingMiddleware(min_interval_seconds=1.0)
-    dp.message.outer_middleware(throttle)
-    dp.callback_query.outer_middleware(throttle)
-
-    users = UserRepository(db)
-    actions = ActionRepository(db)
-    premium_requests = PremiumRequestRepository(db)
-    reports = ReportRepository(db)
-    discovery = DiscoveryService(users, redis_client)
-
-    context = AppContext(
-        settings=settings,
-        db=db,
-        redis=redis_client,
-        users=users,
-        actions=actions,
-        premium_requests=premium_requests,
-        reports=reports,
-        discovery=discovery,
-    )
-    set_app(context)
-
-    for router in get_routers(settings.premium_enabled):
-        dp.include_router(router)
-
-    return RuntimeResources(
-        settings=settings,
-        db=db,
-        redis=redis_client,
-        bot=bot,
-        dp=dp,
-    )
+from app.health import ReadinessProbe
+from app.ingest import ShardedRequestHandler, UpdateShards
+from app.metrics import bind_runtime, render_metrics
+from app.runtime import RuntimeResources, build_runtime, close_runtime, start_runtime
+from app.update_bus import UpdateBus, build_ingress_dispatcher
 
 
 async def _healthcheck(_: web.Request) -> web.Response:
     return web.json_response({"status": "ok"})
 
 
+async def _readiness(request: web.Request) -> web.Response:
+    ready, report = await request.app["readiness"].check()
+    return web.json_response(report, status=200 if ready else 503)
+
+
+async def _metrics(_: web.Request) -> web.Response:
+    body, content_type = render_metrics()
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+
+async def _webhook_stats(request: web.Request) -> web.Response:
+    shards: UpdateShards | None = request.app["shards"]
+    return web.json_response(shards.stats() if shards is not None else {"shards": 0})
+
+
 async def _on_startup(app: web.Application) -> None:
     runtime: RuntimeResources = app["runtime"]
+    if app["shards"] is not None:
+        await app["shards"].start()
+    await start_runtime(runtime)
     await setup_default_commands(runtime.bot)
     await runtime.bot.set_webhook(
         url=runtime.settings.webhook_url,
@@ -94,21 +49,18 @@ async def _on_startup(app: web.Application) -> None:
 
 
 async def _on_shutdown(app: web.Application) -> None:
-    runtime: RuntimeResources = app["runtime"]
-    await runtime.dp.storage.close()
-    await runtime.bot.session.close()
-    await runtime.redis.aclose()
-    await runtime.db.close()
+    if app["shards"] is not None:
+        await app["shards"].close()
+    await close_runtime(app["runtime"])
 
 
-async def _create_web_app() -> web.Application:
-    settings = Settings.from_env()
+async def _create_web_app(settings: Settings) -> web.Application:
     if not settings.webhook_url:
         raise ValueError("WEBHOOK_URL is required in webhook mode.")
     if not settings.webhook_secret_token:
         raise ValueError("WEBHOOK_SECRET_TOKEN is required in webhook mode.")
 
-    runtime = await _build_runtime(settings)
+    runtime = await build_runtime(settings)
     @web.middleware
     async def webhook_secret_middleware(
         request: web.Request,
@@ -122,16 +74,54 @@ async def _create_web_app() -> web.Application:
 
     web_app = web.Application(middlewares=[webhook_secret_middleware])
     web_app["runtime"] = runtime
+    web_app["shards"] = None
+    web_app["readiness"] = ReadinessProbe(
+        runtime.db,
+        runtime.redis,
+        max_pool_wait_ms=settings.ready_max_pool_wait_ms,
+        max_db_ms=settings.ready_max_db_ms,
+        max_redis_ms=settings.ready_max_redis_ms,
+        cache_seconds=settings.ready_cache_seconds,
+    )
 
-    SimpleRequestHandler(
-        dispatcher=runtime.dp,
-        bot=runtime.bot,
-        secret_token=settings.webhook_secret_token,
-    ).register(web_app, path=settings.webhook_path)
+    if settings.update_bus_enabled:
+        bus = UpdateBus(runtime.redis, partitions=settings.update_bus_partitions)
+        await bus.ensure_groups()
+        # Answer Telegram only after the update is safely in the stream.
+        SimpleRequestHandler(
+            dispatcher=build_ingress_dispatcher(bus),
+            bot=runtime.bot,
+            handle_in_background=False,
+            secret_token=settings.webhook_secret_token,
+        ).register(web_app, path=settings.webhook_path)
+    elif settings.webhook_workers > 0:
+        shards = UpdateShards(
+            runtime.dp,
+            runtime.bot,
+            shards=settings.webhook_workers,
+            queue_size=settings.webhook_queue_size,
+        )
+        web_app["shards"] = shards
+        bind_runtime(shards=shards)
+        ShardedRequestHandler(
+            dispatcher=runtime.dp,
+            bot=runtime.bot,
+            shards=shards,
+            secret_token=settings.webhook_secret_token,
+        ).register(web_app, path=settings.webhook_path)
+    else:
+        SimpleRequestHandler(
+            dispatcher=runtime.dp,
+            bot=runtime.bot,
+            secret_token=settings.webhook_secret_token,
+        ).register(web_app, path=settings.webhook_path)
 
     setup_application(web_app, runtime.dp, bot=runtime.bot)
     web_app.router.add_get("/", _healthcheck)
     web_app.router.add_get("/healthz", _healthcheck)
+    web_app.router.add_get("/readyz", _readiness)
+    web_app.router.add_get("/stats/webhook", _webhook_stats)
+    web_app.router.add_get("/metrics", _metrics)
     web_app.on_startup.append(_on_startup)
     web_app.on_shutdown.append(_on_shutdown)
     return web_app
@@ -142,9 +132,9 @@ def main() -> None:
         level=logging.INFO,
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
-    web_app = asyncio.run(_create_web_app())
-    runtime: RuntimeResources = web_app["runtime"]
-    web.run_app(web_app, host="0.0.0.0", port=runtime.settings.port)
+    settings = Settings.from_env()
+    # Build the runtime inside run_app's event loop so pooled connections stay on one loop.
+    web.run_app(_create_web_app(settings), host="0.0.0.0", port=settings.port)
 
 
 if __name__ == "__main__":
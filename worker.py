@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.config import Settings
+from app.metrics import serve_metrics
+from app.runtime import build_runtime, close_runtime, start_runtime
+from app.update_bus import UpdateBus, UpdateBusWorker
+
+
+async def run() -> None:
+    settings = Settings.from_env()
+    runtime = await build_runtime(settings)
+    bus = UpdateBus(runtime.redis, partitions=settings.update_bus_partitions)
+    worker = UpdateBusWorker(bus, runtime.dp, runtime.bot)
+    serve_metrics(settings.metrics_port)
+    try:
+        await start_runtime(runtime)
+        logging.info("Consuming updates as %s", worker.consumer)
+        await worker.run()
+    finally:
+        await close_runtime(runtime)
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()